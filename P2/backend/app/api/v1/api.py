@@ -1,5 +1,9 @@
 from fastapi import APIRouter
-from app.api.v1.endpoints import scoring
+from app.api.v1.endpoints import scoring, books, events, activity, analytics
 
 api_router = APIRouter()
 api_router.include_router(scoring.router, prefix="/scoring", tags=["scoring"])
+api_router.include_router(books.router, prefix="/books", tags=["books"])
+api_router.include_router(events.router, prefix="/events", tags=["events"])
+api_router.include_router(activity.router, prefix="/activity", tags=["activity"])
+api_router.include_router(analytics.router, prefix="/analytics", tags=["analytics"])
@@ -0,0 +1,28 @@
+from fastapi import APIRouter, HTTPException, UploadFile, File
+from typing import Optional
+from app.models.domain import ActivityLinkReport
+from app.services.ingest import IngestionService
+from app.services.matching import link_client_activity
+
+router = APIRouter()
+
+@router.post("/link", response_model=ActivityLinkReport)
+async def link_activity(
+    placement_file: UploadFile = File(...),
+    email_file: Optional[UploadFile] = File(None),
+    calendar_file: Optional[UploadFile] = File(None)
+):
+    """
+    Link email and calendar activity to placement clients by fuzzy client name.
+    """
+    try:
+        placements = IngestionService.parse_placement_csv((await placement_file.read()).decode("utf-8"))
+        emails = IngestionService.parse_email_csv((await email_file.read()).decode("utf-8")) if email_file else []
+        meetings = IngestionService.parse_calendar_csv((await calendar_file.read()).decode("utf-8")) if calendar_file else []
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid CSV: {str(e)}")
+
+    try:
+        return link_client_activity(placements, emails, meetings)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
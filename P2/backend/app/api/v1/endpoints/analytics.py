@@ -0,0 +1,80 @@
+from fastapi import APIRouter, HTTPException, UploadFile, File, Query
+from typing import List, Optional
+from app.models.domain import PlacementIngestSummary, PortfolioRollup, InsurancePlacement
+from app.services.ingest import IngestionService
+from app.services.shared import current_placements, update_placements
+
+router = APIRouter()
+
+@router.post("/placements", response_model=PlacementIngestSummary)
+async def ingest_placements(file: UploadFile = File(...), replace: bool = False):
+    """
+    Load a placement export and update the portfolio rollups incrementally.
+    Rows are upserted by (placementId, carrierGroupLocalId) unless `replace` clears the store first.
+    """
+    try:
+        content = await file.read()
+        placements = IngestionService.parse_placement_csv(content.decode("utf-8"))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid CSV: {str(e)}")
+
+    accepted, store = update_placements(placements, replace)
+    return PlacementIngestSummary(accepted=accepted, totalPlacements=len(store))
+
+@router.get("/placements", response_model=List[InsurancePlacement])
+async def list_placements(
+    carrierGroup: Optional[str] = None,
+    productLine: Optional[str] = None,
+    placementSpecialist: Optional[str] = None,
+    placementStatus: Optional[str] = None,
+    participationStatusCode: Optional[str] = None,
+    placementClientSegmentCode: Optional[str] = None,
+    placementRenewingStatusCode: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=10000)
+):
+    """
+    Held placements matching exact values of the categorical fields
+    (e.g. participationStatusCode=QUOTATION_STATUS_QUOTED).
+    """
+    filters = {
+        "carrierGroup": carrierGroup,
+        "productLine": productLine,
+        "placementSpecialist": placementSpecialist,
+        "placementStatus": placementStatus,
+        "participationStatusCode": participationStatusCode,
+        "placementClientSegmentCode": placementClientSegmentCode,
+        "placementRenewingStatusCode": placementRenewingStatusCode,
+    }
+    return current_placements().select({k: v for k, v in filters.items() if v is not None}, limit)
+
+@router.get("/rollup", response_model=PortfolioRollup)
+async def portfolio_rollup(
+    group_by: List[str] = Query(["carrierGroup"]),
+    carrierGroup: Optional[str] = None,
+    productLine: Optional[str] = None,
+    placementSpecialist: Optional[str] = None,
+    placementClientSegmentCode: Optional[str] = None,
+    expiry_from_days: Optional[int] = None,
+    expiry_to_days: Optional[int] = None,
+    expiring_within_days: int = Query(90, ge=0)
+):
+    """
+    Premium, commission and expiring counts grouped by carrier, product line, specialist
+    and/or client segment, answered from the pre-aggregated rollups.
+    """
+    filters = {
+        "carrierGroup": carrierGroup,
+        "productLine": productLine,
+        "placementSpecialist": placementSpecialist,
+        "placementClientSegmentCode": placementClientSegmentCode,
+    }
+    try:
+        return current_placements().rollup(
+            group_by,
+            {k: v for k, v in filters.items() if v is not None},
+            expiry_from_days,
+            expiry_to_days,
+            expiring_within_days,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -0,0 +1,168 @@
+import asyncio
+from fastapi import APIRouter, HTTPException, Body, Header, Query
+from fastapi.responses import StreamingResponse
+from typing import Dict, List, Optional
+from app.core.config import settings
+from app.models.domain import (
+    Policy, RenewalPipelineItem, PriorityWeights, PolicyBookDelta, PolicyBookState, ExpiryWindowCounts,
+    ScoreBreakdown, ScoreExplainRequest
+)
+from app.services.book import books, BookVersionConflict, PolicyBook
+from app.services.ingest import IngestionService
+from app.services.storage import get_storage
+from app.services.scoring import DEFAULT_WEIGHTS
+from app.services import stream
+
+router = APIRouter()
+
+def _get_book(book_id: str) -> PolicyBook:
+    book = books.get(book_id)
+    if book is None:
+        raise HTTPException(status_code=404, detail=f"Unknown book: {book_id}")
+    return book
+
+def _state(book: PolicyBook) -> PolicyBookState:
+    return PolicyBookState(bookId=book.book_id, version=book.version, size=len(book))
+
+@router.post("", response_model=PolicyBookState)
+async def create_book(
+    policies: List[Policy],
+    csv_content: Optional[str] = Body(None)
+):
+    """
+    Create a server-held policy book from a full snapshot.
+    Later changes are sent as deltas to PATCH /books/{book_id}.
+    """
+    try:
+        enrichment = IngestionService.parse_csv_content(csv_content) if csv_content else []
+        book = books.create()
+        book.apply_delta(None, upserts=policies, enrichment=enrichment)
+        # Record the default-weight ranking so the first PATCH can be answered with a diff
+        book.cached_pipeline()
+        return _state(book)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/{book_id}", response_model=PolicyBookState)
+async def get_book(book_id: str):
+    return _state(_get_book(book_id))
+
+@router.patch("/{book_id}", response_model=PolicyBookState)
+async def apply_delta(book_id: str, delta: PolicyBookDelta):
+    """
+    Apply upserts/deletes against `baseVersion`.
+    - 409 if the book moved on since `baseVersion`; the client should refetch and retry
+    - With `includeChanges`, only pipeline rows whose rank changed since `baseVersion` are
+      returned; `reset` means the full ranking was sent instead
+    """
+    book = _get_book(book_id)
+    try:
+        book.apply_delta(delta.baseVersion, delta.upserts, delta.deletes, delta.enrichment)
+    except BookVersionConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    if delta.includeChanges:
+        return book.rank_changes(delta.weights, delta.baseVersion)
+    return _state(book)
+
+@router.delete("/{book_id}")
+async def delete_book(book_id: str):
+    if not books.delete(book_id):
+        raise HTTPException(status_code=404, detail=f"Unknown book: {book_id}")
+    return {"status": "deleted", "bookId": book_id}
+
+@router.post("/{book_id}/pipeline", response_model=List[RenewalPipelineItem])
+async def book_pipeline(
+    book_id: str,
+    weights: Optional[PriorityWeights] = None,
+    time_window_days: Optional[int] = Query(None, ge=0)
+):
+    """
+    Build the prioritized renewal pipeline for a held book.
+    With `time_window_days`, only policies expiring within the window are scored.
+    """
+    book = _get_book(book_id)
+    try:
+        return book.pipeline(weights, time_window_days)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/{book_id}/ranked", response_model=List[RenewalPipelineItem])
+async def ranked_pipeline(
+    book_id: str,
+    limit: int = Query(50, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    time_window_days: Optional[int] = Query(None, ge=0)
+):
+    """
+    One page of the default-weight pipeline.
+    With SQLite storage this reads persisted scores in index order and only builds the
+    returned rows; otherwise the in-memory pipeline is sliced.
+    """
+    book = _get_book(book_id)
+    storage = get_storage()
+    if storage is not None:
+        return await asyncio.to_thread(storage.ranked_pipeline, book_id, limit, offset, time_window_days)
+    return book.pipeline(None, time_window_days)[offset:offset + limit]
+
+@router.post("/{book_id}/explain", response_model=Dict[str, ScoreBreakdown])
+async def explain_scores(book_id: str, request: ScoreExplainRequest):
+    """
+    Per-factor score breakdown for the rows the user expanded, keyed by policy hash.
+    Pipeline responses leave `scoreBreakdown` empty; fetch it here on drill-down.
+    Hashes not in the book are omitted.
+    """
+    return _get_book(book_id).explain(request.policyHashes, request.weights)
+
+@router.get("/{book_id}/windows", response_model=ExpiryWindowCounts)
+async def book_window_counts(book_id: str):
+    """
+    Policy counts per renewal time window and urgency level, without building the pipeline.
+    """
+    return _get_book(book_id).window_counts()
+
+@router.get("/{book_id}/stream")
+async def stream_pipeline(
+    book_id: str,
+    since_version: Optional[str] = Query(None, description="Resume from this event id (\"version:day\") instead of a full snapshot"),
+    min_score_delta: int = Query(5, ge=0),
+    premiumAtRisk: Optional[float] = None,
+    timeToExpiry: Optional[float] = None,
+    claimsHistory: Optional[float] = None,
+    carrierResponsiveness: Optional[float] = None,
+    churnLikelihood: Optional[float] = None,
+    last_event_id: Optional[str] = Header(None)
+):
+    """
+    Server-Sent Events stream of pipeline rank/urgency changes for a book.
+    - Only rows that enter/leave, change urgency level or move by >= min_score_delta are pushed
+    - Reconnecting clients resume via `since_version` or the standard Last-Event-ID header; a
+      resume from another day (or without one) gets a full snapshot, as urgency moves with the clock
+    - Weights are optional query params; missing ones fall back to the defaults
+    """
+    book = _get_book(book_id)
+    if stream.active_subscriptions >= settings.STREAM_MAX_SUBSCRIBERS:
+        raise HTTPException(status_code=503, detail="Too many open pipeline streams")
+
+    overrides = {
+        "premiumAtRisk": premiumAtRisk,
+        "timeToExpiry": timeToExpiry,
+        "claimsHistory": claimsHistory,
+        "carrierResponsiveness": carrierResponsiveness,
+        "churnLikelihood": churnLikelihood,
+    }
+    overrides = {k: v for k, v in overrides.items() if v is not None}
+    weights = DEFAULT_WEIGHTS.model_copy(update=overrides) if overrides else None
+
+    resume_from = since_version if since_version is not None else last_event_id
+    try:
+        since, since_day = stream.parse_event_id(resume_from) if resume_from else (None, None)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid event id: {resume_from}")
+
+    subscription = stream.PipelineSubscription(book, weights, min_score_delta, since, since_day)
+    return StreamingResponse(
+        subscription.stream(settings.STREAM_HEARTBEAT_SECONDS),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
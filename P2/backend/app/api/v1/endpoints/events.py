@@ -0,0 +1,38 @@
+import asyncio
+from fastapi import APIRouter, HTTPException
+from app.models.domain import EventIngestStatus
+from app.services.events import get_event_ingestor, ContractEventIngestor
+
+router = APIRouter()
+
+def _get_ingestor() -> ContractEventIngestor:
+    ingestor = get_event_ingestor()
+    if ingestor is None:
+        raise HTTPException(status_code=404, detail="Contract event ingestion is not configured (set CONTRACT_EVENT_LOG)")
+    return ingestor
+
+def _status(ingestor: ContractEventIngestor) -> EventIngestStatus:
+    return EventIngestStatus(
+        bookId=ingestor.book.book_id,
+        logPath=ingestor.log_path,
+        offset=ingestor.offset,
+        eventsApplied=ingestor.events_applied,
+        eventsSkipped=ingestor.events_skipped,
+        version=ingestor.book.version,
+    )
+
+@router.get("/status", response_model=EventIngestStatus)
+async def event_status():
+    return _status(_get_ingestor())
+
+@router.post("/sync", response_model=EventIngestStatus)
+async def sync_events():
+    """
+    Catch up with the contract event log now instead of waiting for the next poll.
+    """
+    ingestor = _get_ingestor()
+    try:
+        await asyncio.to_thread(ingestor.run_once)
+        return _status(ingestor)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,8 +1,11 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Body
+from fastapi import APIRouter, HTTPException, UploadFile, File, Body, Query, Form, Response
 from typing import List, Optional
-from app.models.domain import Policy, RenewalPipelineItem, PriorityWeights, CSVRenewalData, PriorityFactors
+from app.models.domain import Policy, RenewalPipelineItem, PriorityWeights, CSVRenewalData, PriorityFactors, BulkIngestReport
 from app.services.scoring import ScoringService
 from app.services.ingest import IngestionService
+from app.services.book import books
+from app.services.bulk import bulk_ingest
+from app.services.rejects import RejectTracker, quarantine_store
 
 router = APIRouter()
 
@@ -25,10 +28,12 @@ async def calculate_score(
 async def build_pipeline(
     policies: List[Policy], 
     csv_content: Optional[str] = Body(None),
-    weights: Optional[PriorityWeights] = None
+    weights: Optional[PriorityWeights] = None,
+    time_window_days: Optional[int] = Query(None, ge=0)
 ):
     """
     Build a full prioritized renewal pipeline.
+    Pass `time_window_days` (e.g. 7/30/90/180) to score only policies expiring within it.
     """
     try:
         # Parse CSV if provided
@@ -37,43 +42,71 @@ async def build_pipeline(
             data = IngestionService.parse_csv_content(csv_content)
             csv_map = {item.policyHash: item for item in data}
 
-        pipeline = []
-        for policy in policies:
-            # Skip inactive policies
-            if policy.status != 1: continue
-
-            csv_data = csv_map.get(policy.policyHash)
-            factors = ScoringService.calculate_priority_factors(policy, policies, csv_data)
-            
-            # Use provided weights or defaults
-            final_score = ScoringService.calculate_total_score(factors, weights) if weights else ScoringService.calculate_total_score(factors)
-            
-            days = ScoringService.calculate_days_until_expiry(policy)
-            
-            item = RenewalPipelineItem(
-                policy=policy,
-                daysUntilExpiry=days,
-                priorityScore=final_score,
-                urgencyLevel=ScoringService.get_urgency_level(days),
-                factors=factors,
-                source=None # Simplified for API response
-            )
-            pipeline.append(item)
-            
-        # Sort by score descending
-        pipeline.sort(key=lambda x: x.priorityScore, reverse=True)
-        return pipeline
+        return ScoringService.build_pipeline(policies, csv_map, weights, time_window_days=time_window_days)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/ingest/csv", response_model=List[CSVRenewalData])
-async def parse_csv(file: UploadFile = File(...)):
+async def parse_csv(response: Response, file: UploadFile = File(...)):
     """
     Robust CSV parsing endpoint.
+    Rejected rows are reported in the X-Rejected-Rows header and, when present,
+    downloadable from /ingest/quarantine/{X-Quarantine-Id}.
     """
     try:
         content = await file.read()
-        return IngestionService.parse_csv_content(content.decode('utf-8'))
+        rejects = RejectTracker(source="renewal")
+        records = IngestionService.parse_csv_content(content.decode('utf-8'), rejects=rejects)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Invalid CSV: {str(e)}")
+
+    response.headers["X-Rejected-Rows"] = str(rejects.rejected)
+    quarantine_id = quarantine_store.add(rejects)
+    if quarantine_id:
+        response.headers["X-Quarantine-Id"] = quarantine_id
+    return records
+
+@router.get("/ingest/quarantine/{quarantine_id}")
+async def download_quarantine(quarantine_id: str):
+    """
+    Rejected rows of a recent ingest as CSV: line number, reason, then the original cells.
+    """
+    rejects = quarantine_store.get(quarantine_id)
+    if rejects is None:
+        raise HTTPException(status_code=404, detail=f"Unknown or expired quarantine report: {quarantine_id}")
+    return Response(
+        content=rejects.to_csv(),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="quarantine-{rejects.source}-{quarantine_id}.csv"'}
+    )
+
+@router.post("/ingest/bulk", response_model=BulkIngestReport)
+async def ingest_bulk(
+    renewal_file: Optional[UploadFile] = File(None),
+    email_file: Optional[UploadFile] = File(None),
+    calendar_file: Optional[UploadFile] = File(None),
+    placement_file: Optional[UploadFile] = File(None),
+    book_id: Optional[str] = Form(None),
+    replace_placements: bool = Form(False)
+):
+    """
+    Onboard several sources in one request.
+    Files are parsed concurrently on a worker pool and joined once at the end;
+    the report has per-file row counts, rejects and parse timings.
+    """
+    files = {"renewal": renewal_file, "email": email_file, "calendar": calendar_file, "placement": placement_file}
+    uploads = [(kind, f.filename, await f.read()) for kind, f in files.items() if f is not None]
+    if not uploads:
+        raise HTTPException(status_code=400, detail="No files uploaded")
+    if renewal_file is not None and not book_id:
+        raise HTTPException(status_code=400, detail="renewal_file needs a book_id to apply the enrichment to")
+    if book_id and books.get(book_id) is None:
+        raise HTTPException(status_code=404, detail=f"Unknown book: {book_id}")
+
+    try:
+        return await bulk_ingest(uploads, book_id, replace_placements)
+    except UnicodeDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid CSV: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,5 +1,5 @@
 import logging
-from typing import List
+from typing import List, Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -7,6 +7,39 @@ class Settings(BaseSettings):
     API_V1_STR: str = "/api/v1"
     LOG_LEVEL: str = "INFO"
     CORS_ORIGINS: List[str] = ["http://localhost:3000"]
+
+    # Contract event ingestion (append-only JSONL log standing in for the chain)
+    CONTRACT_EVENT_LOG: Optional[str] = None
+    CONTRACT_EVENT_CHECKPOINT: Optional[str] = None
+    CONTRACT_EVENT_BOOK_ID: str = "chain"
+    CONTRACT_EVENT_BATCH_SIZE: int = 100000
+    CONTRACT_EVENT_POLL_SECONDS: float = 1.0
+    # In-memory books are snapshotted after this many events or seconds, whichever comes first
+    CONTRACT_EVENT_SNAPSHOT_EVENTS: int = 100000
+    CONTRACT_EVENT_SNAPSHOT_SECONDS: float = 300.0
+
+    # Bulk ingest: worker processes used to parse uploaded files in parallel (0 = threads)
+    INGEST_WORKERS: int = 4
+
+    # uvicorn worker processes. More than 1 needs SHARED_WORKERS_EXPERIMENTAL (see below)
+    WORKERS: int = 1
+    # Experimental multi-worker mode. Only the placement table (and its rollup cube) is shared
+    # between workers, through SHARED_STATE_DIR, and one worker tails the contract event log.
+    # Books and their PATCH versions, stream subscribers and the reject quarantine stay
+    # per-worker: use it for the placement/analytics endpoints, or route each book to one
+    # worker (sticky sessions) in front of it
+    SHARED_WORKERS_EXPERIMENTAL: bool = False
+    # Directory (ideally on tmpfs, e.g. /dev/shm) where ingested placement tables are published
+    # for every process on the host to map read-only. main.py creates one when it launches
+    # several workers without it
+    SHARED_STATE_DIR: Optional[str] = None
+
+    # Optional embedded persistence for books and placements (e.g. "broker_copilot.db")
+    SQLITE_PATH: Optional[str] = None
+
+    # Pipeline streaming (SSE)
+    STREAM_HEARTBEAT_SECONDS: float = 15.0
+    STREAM_MAX_SUBSCRIBERS: int = 500
     
     class Config:
         case_sensitive = True
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional, Union
+from typing import Dict, List, Optional, Union
 from datetime import datetime
 
 class Policy(BaseModel):
@@ -54,6 +54,39 @@ class InsurancePlacement(BaseModel):
     daysUntilExpiry: Optional[int] = None
     priorityScore: Optional[int] = None
 
+class EmailActivity(BaseModel):
+    emailId: str
+    subject: str = ""
+    clientName: str
+    receivedAt: str = ""
+    policyId: str = ""
+    summary: str = ""
+    sentiment: str = ""
+    threadCount: int = 0
+    sourceLink: str = ""
+
+class CalendarActivity(BaseModel):
+    eventId: str
+    title: str = ""
+    clientName: str
+    meetingDate: str = ""
+    policyId: str = ""
+    meetingNotes: str = ""
+    participants: List[str] = []
+    sourceLink: str = ""
+
+class ClientActivityLink(BaseModel):
+    clientKey: str
+    clientName: str
+    placementIds: List[str]
+    emails: List[EmailActivity] = []
+    meetings: List[CalendarActivity] = []
+
+class ActivityLinkReport(BaseModel):
+    clients: List[ClientActivityLink]
+    unmatchedEmails: List[str] = [] # client names that resolved to no placement client
+    unmatchedMeetings: List[str] = []
+
 class PriorityFactors(BaseModel):
     premiumAtRisk: int
     timeToExpiry: int
@@ -93,6 +126,8 @@ class ScoreBreakdownFactor(BaseModel):
     maxScore: int
     description: str
     impact: str # "positive" | "negative" | "neutral"
+    rawScore: Optional[int] = None # factor score before weighting (0-100)
+    weight: Optional[float] = None # share of the total score this factor can contribute (0-1)
 
 class ScoreBreakdown(BaseModel):
     total: int
@@ -107,3 +142,98 @@ class RenewalPipelineItem(BaseModel):
     factors: PriorityFactors
     source: Optional[DataSource] = None
     scoreBreakdown: Optional[ScoreBreakdown] = None
+
+class PolicyBookDelta(BaseModel):
+    baseVersion: int = Field(..., description="Book version the delta was computed against")
+    upserts: List[Policy] = []
+    deletes: List[str] = []
+    enrichment: List[CSVRenewalData] = []
+    weights: Optional[PriorityWeights] = None
+    includeChanges: bool = False
+
+class ScoreExplainRequest(BaseModel):
+    policyHashes: List[str] = Field(..., max_length=200, description="Rows to explain (the ones the user expanded)")
+    weights: Optional[PriorityWeights] = None
+
+class PipelineRankChange(BaseModel):
+    rank: int
+    item: RenewalPipelineItem
+
+class PolicyBookState(BaseModel):
+    bookId: str
+    version: int
+    size: int
+    changes: Optional[List[PipelineRankChange]] = None
+    removed: Optional[List[str]] = None
+    reset: bool = False # True when `changes` is the full ranking because baseVersion's ranking is no longer kept
+
+class EventIngestStatus(BaseModel):
+    bookId: str
+    logPath: str
+    offset: int
+    eventsApplied: int
+    eventsSkipped: int
+    version: int
+
+class PipelineRowUpdate(BaseModel):
+    policyHash: str
+    rank: Optional[int] = None # None when the row left the pipeline
+    priorityScore: Optional[int] = None
+    urgencyLevel: Optional[str] = None
+    previousScore: Optional[int] = None
+    previousUrgency: Optional[str] = None
+
+class PipelineStreamEvent(BaseModel):
+    bookId: str
+    version: int
+    day: Optional[int] = None # epoch day (UTC) the scores were computed on; part of the event id
+    reset: bool = False # True when the client must drop its state and use `rows` as a full snapshot
+    rows: List[PipelineRowUpdate]
+
+class PlacementIngestSummary(BaseModel):
+    accepted: int
+    totalPlacements: int
+
+class PortfolioRollupRow(BaseModel):
+    group: Dict[str, str]
+    placementCount: int
+    totalPremium: float
+    commissionAmount: float
+    expiringCount: int
+
+class PortfolioRollup(BaseModel):
+    groupBy: List[str]
+    expiringWithinDays: int
+    rows: List[PortfolioRollupRow]
+
+class TimeWindowCount(BaseModel):
+    days: int
+    label: str
+    count: int
+
+class ExpiryWindowCounts(BaseModel):
+    bookId: str
+    version: int
+    total: int
+    windows: List[TimeWindowCount]
+    urgency: Dict[str, int]
+
+class IngestFileReport(BaseModel):
+    kind: str # "renewal" | "email" | "calendar" | "placement"
+    filename: Optional[str] = None
+    rows: int = 0
+    accepted: int = 0
+    rejected: int = 0
+    rejectReasons: Dict[str, int] = {}
+    cellIssues: Dict[str, int] = {} # bad cells dropped from otherwise accepted rows
+    quarantineId: Optional[str] = None
+    seconds: float = 0.0
+
+class BulkIngestReport(BaseModel):
+    files: List[IngestFileReport]
+    linkedClients: int = 0
+    unmatchedEmails: int = 0
+    unmatchedMeetings: int = 0
+    bookId: Optional[str] = None
+    bookVersion: Optional[int] = None
+    totalSeconds: float
@@ -0,0 +1,416 @@
+import asyncio
+import bisect
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from app.models.domain import (
+    Policy, CSVRenewalData, PriorityWeights, RenewalPipelineItem, PipelineRankChange, PolicyBookState,
+    ExpiryWindowCounts, TimeWindowCount, ScoreBreakdown
+)
+from app.services.scoring import ScoringService, DEFAULT_WEIGHTS, SECONDS_PER_DAY, TIME_WINDOWS, URGENCY_LEVEL_DAYS
+from app.services.storage import SQLiteStore, get_storage
+
+logger = logging.getLogger(__name__)
+
+# How many weight sets we remember built pipelines / explanations for
+MAX_TRACKED_RANKINGS = 8
+# How many (version, weight set) rankings we keep to diff PATCH responses against
+MAX_RANKING_SNAPSHOTS = 32
+# How many versions of touched-hash history we keep for stream resumption
+CHANGELOG_SIZE = 256
+# Deltas touching more than 1/N of the expiry index rebuild it with one sort
+INDEX_REBUILD_FRACTION = 8
+
+
+class BookVersionConflict(Exception):
+    """Raised when a delta targets a version other than the book's current one."""
+
+    def __init__(self, book_id: str, expected: int, actual: int):
+        self.expected = expected
+        self.actual = actual
+        super().__init__(f"Book {book_id} is at version {actual}, delta was based on {expected}")
+
+
+def expiry_entry(policy: Policy) -> Optional[Tuple[int, str]]:
+    """Expiry index entry; only active policies are indexed (pipelines skip the rest)."""
+    if policy.status != 1:
+        return None
+    return (int(policy.startTime) + int(policy.duration), policy.policyHash)
+
+
+def weights_key(weights: Optional[PriorityWeights]) -> Tuple[float, ...]:
+    w = weights or DEFAULT_WEIGHTS
+    return (w.premiumAtRisk, w.timeToExpiry, w.claimsHistory, w.carrierResponsiveness, w.churnLikelihood)
+
+
+class PolicyBook:
+    """
+    Server-held set of policies with a monotonically increasing version.
+    - Clients send upsert/delete deltas against `version` instead of the full list
+    - The book-wide max premium is maintained incrementally so scoring stays O(n)
+    - Rankings are kept per version and weight set so a delta's response can carry only
+      the rank changes since the version the client based it on
+    - Subscribers (asyncio events) are woken on every version bump; wakeups coalesce
+    - Active policies are kept in a list sorted by expiry timestamp, so time windows
+      are a binary search and only policies inside the window get scored
+    - Score explanations are built only for the rows a client asks about and cached
+      per version, day and weight set, so the ranked list never pays for them
+    - With a SQLiteStore attached, every applied delta is also written through to it
+    """
+
+    def __init__(self, book_id: str, storage: Optional[SQLiteStore] = None):
+        self.book_id = book_id
+        self.storage = storage
+        self.version = 0
+        self._policies: Dict[str, Policy] = {}
+        self._enrichment: Dict[str, CSVRenewalData] = {}
+        self._max_premium = 0.0
+        self._expiry_index: List[Tuple[int, str]] = []
+        self._rankings: "OrderedDict[Tuple, Dict[str, int]]" = OrderedDict()
+        self._pipelines: "OrderedDict[Tuple, List[RenewalPipelineItem]]" = OrderedDict()
+        self._explanations: "OrderedDict[Tuple, Dict[str, ScoreBreakdown]]" = OrderedDict()
+        self._changelog: deque = deque(maxlen=CHANGELOG_SIZE)
+        self._subscribers: Dict[asyncio.Event, asyncio.AbstractEventLoop] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._policies)
+
+    def get(self, policy_hash: str) -> Optional[Policy]:
+        return self._policies.get(policy_hash)
+
+    def policies(self) -> List[Policy]:
+        with self._lock:
+            return list(self._policies.values())
+
+    def enrichment(self) -> Dict[str, CSVRenewalData]:
+        with self._lock:
+            return dict(self._enrichment)
+
+    def apply_delta(
+        self,
+        base_version: Optional[int],
+        upserts: Iterable[Policy] = (),
+        deletes: Iterable[str] = (),
+        enrichment: Iterable[CSVRenewalData] = (),
+        source_offset: Optional[int] = None
+    ) -> Set[str]:
+        """
+        Applies a delta atomically and bumps the version once.
+        - `base_version=None` skips the optimistic concurrency check (trusted server-side writers)
+        - `source_offset` is the event log position of an ingested delta, persisted with it
+        - Returns the set of policy hashes touched by the delta
+        """
+        with self._lock:
+            if base_version is not None and base_version != self.version:
+                raise BookVersionConflict(self.book_id, base_version, self.version)
+
+            upserts = list(upserts)
+            deletes = list(deletes)
+            enrichment = list(enrichment)
+            touched: Set[str] = {h for h in deletes if h in self._policies}
+            touched.update(policy.policyHash for policy in upserts)
+            touched.update(data.policyHash for data in enrichment)
+            if not touched:
+                return touched
+            # Written through before memory changes: a failed write leaves the book as it was
+            if self.storage is not None:
+                self.storage.save_delta(self.book_id, self.version + 1, upserts, deletes, enrichment, source_offset)
+
+            rescan_max = False
+            rebuild_index = len(upserts) + len(deletes) > len(self._expiry_index) // INDEX_REBUILD_FRACTION
+
+            for policy_hash in deletes:
+                old = self._policies.pop(policy_hash, None)
+                self._enrichment.pop(policy_hash, None)
+                if old is not None:
+                    rescan_max = rescan_max or old.premium >= self._max_premium
+                    if not rebuild_index:
+                        self._update_index(old, None)
+
+            for policy in upserts:
+                old = self._policies.get(policy.policyHash)
+                if old is not None and old.premium >= self._max_premium and policy.premium < old.premium:
+                    rescan_max = True
+                self._policies[policy.policyHash] = policy
+                if not rebuild_index:
+                    self._update_index(old, policy)
+                if policy.premium > self._max_premium:
+                    self._max_premium = float(policy.premium)
+
+            for data in enrichment:
+                self._enrichment[data.policyHash] = data
+
+            if rescan_max:
+                self._max_premium = ScoringService.calculate_max_premium(self._policies.values())
+            if rebuild_index:
+                entries = (expiry_entry(p) for p in self._policies.values())
+                self._expiry_index = sorted(e for e in entries if e is not None)
+
+            self.version += 1
+            self._changelog.append((self.version, frozenset(touched)))
+            self._notify()
+            return touched
+
+    def _update_index(self, old: Optional[Policy], new: Optional[Policy]):
+        old_entry = expiry_entry(old) if old is not None else None
+        new_entry = expiry_entry(new) if new is not None else None
+        if old_entry == new_entry:
+            return
+        if old_entry is not None:
+            i = bisect.bisect_left(self._expiry_index, old_entry)
+            if i < len(self._expiry_index) and self._expiry_index[i] == old_entry:
+                del self._expiry_index[i]
+        if new_entry is not None:
+            bisect.insort(self._expiry_index, new_entry)
+
+    def _expiring_within(self, days: int, now: int) -> int:
+        """Number of index entries (a prefix) with days-until-expiry <= `days`."""
+        # ceil((expiry - now) / day) <= days  <=>  expiry <= now + days * day
+        return bisect.bisect_right(self._expiry_index, (now + days * SECONDS_PER_DAY, "\uffff"))
+
+    def window_counts(self, now: Optional[int] = None) -> ExpiryWindowCounts:
+        """
+        Active policy counts per TIME_WINDOWS bucket and urgency level, via binary search only.
+        Window counts are cumulative (the 90-day bucket includes the 30-day one), like the pipeline filter.
+        """
+        now = int(time.time()) if now is None else now
+        with self._lock:
+            total = len(self._expiry_index)
+            windows = [
+                TimeWindowCount(days=w["days"], label=w["label"], count=self._expiring_within(w["days"], now))
+                for w in TIME_WINDOWS
+            ]
+            urgency = {}
+            below = 0
+            for level, max_days in URGENCY_LEVEL_DAYS:
+                upto = self._expiring_within(max_days, now)
+                urgency[level] = upto - below
+                below = upto
+            urgency["low"] = total - below
+            return ExpiryWindowCounts(bookId=self.book_id, version=self.version, total=total, windows=windows, urgency=urgency)
+
+    def subscribe(self) -> asyncio.Event:
+        """Registers an event that is set (from any thread) whenever the version changes."""
+        event = asyncio.Event()
+        with self._lock:
+            self._subscribers[event] = asyncio.get_running_loop()
+        return event
+
+    def unsubscribe(self, event: asyncio.Event):
+        with self._lock:
+            self._subscribers.pop(event, None)
+
+    def _notify(self):
+        for event, loop in list(self._subscribers.items()):
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # Event loop already closed; the connection is gone
+                self._subscribers.pop(event, None)
+
+    def changed_since(self, version: int) -> Optional[Set[str]]:
+        """
+        Hashes touched after `version`, or None when the changelog no longer reaches back that far.
+        """
+        with self._lock:
+            if version > self.version:
+                return None
+            if version == self.version:
+                return set()
+            if not self._changelog or self._changelog[0][0] > version + 1:
+                return None
+            touched: Set[str] = set()
+            for entry_version, hashes in self._changelog:
+                if entry_version > version:
+                    touched.update(hashes)
+            return touched
+
+    def pipeline(
+        self,
+        weights: Optional[PriorityWeights] = None,
+        time_window_days: Optional[int] = None
+    ) -> List[RenewalPipelineItem]:
+        """
+        Scores the book. With `time_window_days`, only policies expiring within the window
+        (found by binary search on the expiry index) are scored; premium normalization
+        still uses the book-wide max.
+        Full builds go through cached_pipeline, so their ranking is recorded for rank diffs.
+        """
+        if time_window_days is None:
+            return list(self.cached_pipeline(weights)[1])
+        _, policies, csv_map, max_premium = self._snapshot(time_window_days)
+        return ScoringService.build_pipeline(policies, csv_map, weights, max_premium)
+
+    def _snapshot(
+        self, time_window_days: Optional[int] = None
+    ) -> Tuple[int, List[Policy], Dict[str, CSVRenewalData], float]:
+        """(version, policies, enrichment, max premium) read together, so a build matches its version."""
+        with self._lock:
+            if time_window_days is None:
+                return self.version, list(self._policies.values()), dict(self._enrichment), self._max_premium
+            end = self._expiring_within(time_window_days, int(time.time()))
+            policies = []
+            csv_map = {}
+            # Only the window's enrichment rows are looked up; the rest of the book is never touched
+            for _, policy_hash in self._expiry_index[:end]:
+                policies.append(self._policies[policy_hash])
+                data = self._enrichment.get(policy_hash)
+                if data is not None:
+                    csv_map[policy_hash] = data
+            return self.version, policies, csv_map, self._max_premium
+
+    def cached_pipeline(self, weights: Optional[PriorityWeights] = None) -> Tuple[int, List[RenewalPipelineItem]]:
+        """
+        Returns (version, pipeline), reusing the last build for the same version, weights and day.
+        Lets many stream subscribers with the same weights share one scoring pass.
+        Every build also records its ranking, so any version a client has been shown can
+        later be diffed against (rank_changes).
+        Callers must treat the returned list as read-only.
+        """
+        with self._lock:
+            key = (self.version, int(time.time()) // SECONDS_PER_DAY, weights_key(weights))
+            cached = self._pipelines.get(key)
+        if cached is not None:
+            return key[0], cached
+
+        version, policies, csv_map, max_premium = self._snapshot()
+        pipeline = ScoringService.build_pipeline(policies, csv_map, weights, max_premium)
+        ranks = {item.policy.policyHash: rank for rank, item in enumerate(pipeline, start=1)}
+        with self._lock:
+            self._pipelines[(version,) + key[1:]] = pipeline
+            while len(self._pipelines) > MAX_TRACKED_RANKINGS:
+                self._pipelines.popitem(last=False)
+            self._rankings[(version, key[2])] = ranks
+            self._rankings.move_to_end((version, key[2]))
+            while len(self._rankings) > MAX_RANKING_SNAPSHOTS:
+                self._rankings.popitem(last=False)
+        return version, pipeline
+
+    def explain(
+        self, policy_hashes: Iterable[str], weights: Optional[PriorityWeights] = None
+    ) -> Dict[str, ScoreBreakdown]:
+        """
+        Score breakdowns for the given policies only; unknown hashes are left out.
+        Each policy is scored on its own against the book-wide max premium, so the cost
+        is proportional to the number of hashes asked for, not to the book size.
+        """
+        with self._lock:
+            key = (self.version, int(time.time()) // SECONDS_PER_DAY, weights_key(weights))
+            cache = self._explanations.pop(key, None)
+            if cache is None:
+                cache = {}
+            self._explanations[key] = cache
+            while len(self._explanations) > MAX_TRACKED_RANKINGS:
+                self._explanations.popitem(last=False)
+
+            explained = {}
+            for policy_hash in policy_hashes:
+                breakdown = cache.get(policy_hash)
+                if breakdown is None:
+                    policy = self._policies.get(policy_hash)
+                    if policy is None:
+                        continue
+                    csv_data = self._enrichment.get(policy_hash)
+                    factors = ScoringService.calculate_priority_factors(policy, [], csv_data, self._max_premium)
+                    breakdown = cache[policy_hash] = ScoringService.explain_score(
+                        policy, factors, weights, csv_data, self._max_premium
+                    )
+                explained[policy_hash] = breakdown
+            return explained
+
+    def rank_changes(self, weights: Optional[PriorityWeights], since_version: int) -> PolicyBookState:
+        """
+        Book state plus the pipeline rows whose rank changed since `since_version` (a delta's
+        base version) and the hashes that left the pipeline.
+        Rankings are recorded by every full pipeline build (cached_pipeline). When none is
+        kept for that version and weight set, `reset` is set and every row is reported; the
+        client must replace its list.
+        """
+        key = weights_key(weights)
+        with self._lock:
+            previous = self._rankings.get((since_version, key))
+        version, pipeline = self.cached_pipeline(weights)
+        with self._lock:
+            size = len(self._policies)
+
+        state = PolicyBookState(bookId=self.book_id, version=version, size=size, reset=previous is None)
+        previous = previous or {}
+        state.changes = [
+            PipelineRankChange(rank=rank, item=item)
+            for rank, item in enumerate(pipeline, start=1)
+            if previous.get(item.policy.policyHash) != rank
+        ]
+        current = {item.policy.policyHash for item in pipeline}
+        state.removed = [policy_hash for policy_hash in previous if policy_hash not in current]
+        return state
+
+
+class BookRegistry:
+    """
+    In-process registry of policy books keyed by id.
+    When SQLite storage is configured, books are persisted and reloaded on first access
+    after a restart.
+    """
+
+    def __init__(self):
+        self._books: Dict[str, PolicyBook] = {}
+        self._lock = threading.Lock()
+
+    def create(self, book_id: Optional[str] = None) -> PolicyBook:
+        book = PolicyBook(book_id or uuid.uuid4().hex, get_storage())
+        with self._lock:
+            self._books[book.book_id] = book
+        logger.info(f"Created policy book {book.book_id}")
+        return book
+
+    def _load(self, book_id: str) -> Optional[PolicyBook]:
+        storage = get_storage()
+        persisted = storage.load_book(book_id) if storage is not None else None
+        if persisted is None:
+            return None
+        version, policies, enrichment = persisted
+        book = PolicyBook(book_id)
+        book.apply_delta(None, upserts=policies, enrichment=enrichment)
+        book.version = version
+        book.storage = storage
+        # History before the reload is gone: resuming from any older version must reset
+        book._changelog.clear()
+        logger.info(f"Loaded policy book {book_id} (version {version}, {len(book)} policies) from storage")
+        return book
+
+    def get(self, book_id: str) -> Optional[PolicyBook]:
+        book = self._books.get(book_id)
+        if book is None and get_storage() is not None:
+            with self._lock:
+                book = self._books.get(book_id)
+                if book is None:
+                    book = self._load(book_id)
+                    if book is not None:
+                        self._books[book_id] = book
+        return book
+
+    def get_or_create(self, book_id: str) -> PolicyBook:
+        book = self.get(book_id)
+        if book is not None:
+            return book
+        with self._lock:
+            book = self._books.get(book_id)
+            if book is None:
+                book = self._books[book_id] = PolicyBook(book_id, get_storage())
+            return book
+
+    def delete(self, book_id: str) -> bool:
+        storage = get_storage()
+        with self._lock:
+            deleted = self._books.pop(book_id, None) is not None
+        if storage is not None and (deleted or storage.has_book(book_id)):
+            storage.delete_book(book_id)
+            deleted = True
+        return deleted
+
+
+books = BookRegistry()
@@ -0,0 +1,103 @@
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Optional, Tuple
+from app.core.config import settings
+from app.models.domain import BulkIngestReport
+from app.services.book import books
+from app.services.ingest import IngestionService
+from app.services.matching import link_activity, link_client_activity
+from app.services.rejects import quarantine_store
+from app.services.shared import current_placements, update_placements
+
+logger = logging.getLogger(__name__)
+
+INGEST_KINDS = ["renewal", "email", "calendar", "placement"]
+
+_pool: Optional[Executor] = None
+
+def get_ingest_pool() -> Executor:
+    """
+    Shared pool for parsing uploads. CSV parsing is CPU-bound Python, so real
+    parallelism needs processes; "spawn" avoids forking a threaded server.
+    """
+    global _pool
+    if _pool is None:
+        if settings.INGEST_WORKERS > 0:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.INGEST_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        else:
+            _pool = ThreadPoolExecutor(max_workers=len(INGEST_KINDS))
+    return _pool
+
+def shutdown_ingest_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def bulk_ingest(
+    uploads: List[Tuple[str, Optional[str], bytes]],
+    book_id: Optional[str] = None,
+    replace_placements: bool = False
+) -> BulkIngestReport:
+    """
+    Parses (kind, filename, content) uploads concurrently, then runs the joins once:
+    - placements are upserted into the placement store (rollups update incrementally)
+    - email/calendar activity is linked to placement clients
+    - renewal enrichment is applied to `book_id`, which is required with a renewal upload
+    Workers return plain tuples; records are rebuilt here, placements as PlacementRows.
+    """
+    if book_id is None and any(kind == "renewal" for kind, _, _ in uploads):
+        raise ValueError("Renewal uploads need a book_id to apply the enrichment to")
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    pool = get_ingest_pool()
+    results = await asyncio.gather(*(
+        loop.run_in_executor(pool, IngestionService.parse_upload, kind, filename, content)
+        for kind, filename, content in uploads
+    ))
+
+    rows_by_kind = {}
+    reports = []
+    for (kind, _, _), (rows, report, rejects) in zip(uploads, results):
+        rows_by_kind.setdefault(kind, []).extend(rows)
+        report.quarantineId = quarantine_store.add(rejects)
+        reports.append(report)
+
+    def join() -> BulkIngestReport:
+        summary = BulkIngestReport(files=reports, totalSeconds=0.0)
+        parsed = {kind: IngestionService.records_from_rows(kind, rows) for kind, rows in rows_by_kind.items()}
+        if "placement" in parsed:
+            update_placements(parsed["placement"], replace_placements)
+
+        if "email" in parsed or "calendar" in parsed:
+            emails, meetings = parsed.get("email", []), parsed.get("calendar", [])
+            if "placement" in parsed:
+                link = link_client_activity(parsed["placement"], emails, meetings)
+            else:
+                # Only the link counts are reported: the stored client dictionary is enough
+                clients = current_placements().client_names()
+                link = link_activity({client: [] for client in clients}, emails, meetings)
+            summary.linkedClients = sum(1 for c in link.clients if c.emails or c.meetings)
+            summary.unmatchedEmails = len(link.unmatchedEmails)
+            summary.unmatchedMeetings = len(link.unmatchedMeetings)
+
+        if "renewal" in parsed:
+            book = books.get(book_id)
+            if book is None:
+                raise ValueError(f"Unknown book: {book_id}")
+            book.apply_delta(None, enrichment=parsed["renewal"])
+            summary.bookId = book.book_id
+            summary.bookVersion = book.version
+        return summary
+
+    summary = await asyncio.to_thread(join)
+    summary.totalSeconds = round(time.perf_counter() - started, 4)
+    logger.info(f"Bulk ingest of {len(uploads)} files finished in {summary.totalSeconds}s")
+    return summary
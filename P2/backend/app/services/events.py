@@ -0,0 +1,284 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+from pydantic import ValidationError
+from app.models.domain import Policy
+from app.core.config import settings
+from app.services.book import PolicyBook, books
+from app.services.scoring import SECONDS_PER_DAY
+
+logger = logging.getLogger(__name__)
+
+# Policy status codes as stored on-chain
+STATUS_PENDING = 0
+STATUS_ACTIVE = 1
+STATUS_EXPIRED = 2
+
+
+class ContractEventIngestor:
+    """
+    Tails an append-only JSONL log of contract events and applies them to a PolicyBook.
+    One event per line, mirroring the contract's events plus the call arguments:
+      {"event": "PolicyCreated", "hash": ..., "customer": ..., "policyName": ..., "policyType": ...,
+       "coverageAmount": ..., "premium": ..., "durationInDays": ..., "notes": ..., "timestamp": ...}
+      {"event": "PolicySigned", "hash": ..., "timestamp": ...}
+      {"event": "PolicyRenewed", "hash": ..., "renewalCount": ..., "additionalDays": ...}
+      {"event": "PolicyExpired", "hash": ...}
+    - Events are applied in batches: each policy touched by a batch is validated once
+      and the book version is bumped once per batch, not per event
+    - Events that fail to parse, or leave their policy invalid, are counted and skipped;
+      the offset only moves past a batch once the batch has been applied
+    - The checkpoint (offset only) is rewritten after every poll that applied events. For
+      books without storage, a snapshot of the book plus its offset is written every
+      `snapshot_events` events or `snapshot_seconds`, and a restart restores the snapshot
+      and replays the log from there. Persisted books store each batch's end offset in the
+      same transaction as its delta and resume from that, never re-applying a batch
+    """
+
+    def __init__(
+        self,
+        book: PolicyBook,
+        log_path: str,
+        checkpoint_path: Optional[str] = None,
+        batch_size: int = 100000,
+        snapshot_events: int = 100000,
+        snapshot_seconds: float = 300.0
+    ):
+        self.book = book
+        self.log_path = log_path
+        self.checkpoint_path = checkpoint_path or f"{log_path}.checkpoint"
+        self.snapshot_path = f"{self.checkpoint_path}.snapshot"
+        self.batch_size = batch_size
+        self.snapshot_events = snapshot_events
+        self.snapshot_seconds = snapshot_seconds
+        self.offset = 0
+        self.events_applied = 0
+        self.events_skipped = 0
+        self._snapshot_applied = 0
+        self._snapshot_time = time.monotonic()
+        self._lock = threading.Lock()
+        self._load_checkpoint()
+
+    @staticmethod
+    def _read_json(path: str) -> Optional[dict]:
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Ignoring unreadable checkpoint {path}: {e}")
+            return None
+
+    @staticmethod
+    def _write_json(path: str, data: dict):
+        """Writes atomically (write to temp file, then rename)."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            # json.dumps uses the C encoder; json.dump streams through the slow Python one
+            f.write(json.dumps(data))
+        os.replace(tmp_path, path)
+
+    def _load_checkpoint(self):
+        if self.book.storage is not None:
+            # The book was reloaded from storage. Each batch's offset is committed with its delta,
+            # so that offset is exactly where the persisted events end
+            checkpoint = self._read_json(self.checkpoint_path) or {}
+            offset = self.book.storage.source_offset(self.book.book_id)
+            if offset is None and checkpoint:
+                # Written by an older build: only trustworthy if no batch landed after it
+                if checkpoint.get("version") != self.book.version:
+                    raise RuntimeError(
+                        f"Checkpoint {self.checkpoint_path} is at book version {checkpoint.get('version')}, "
+                        f"book {self.book.book_id} is at {self.book.version}; refusing to replay events twice"
+                    )
+                offset = checkpoint.get("offset", 0)
+            self.offset = offset or 0
+            self.events_applied = self._snapshot_applied = checkpoint.get("eventsApplied", 0)
+            logger.info(f"Resuming persisted book {self.book.book_id} at offset {self.offset}")
+            return
+
+        snapshot = self._read_json(self.snapshot_path)
+        if snapshot is None:
+            return
+        self.offset = snapshot.get("offset", 0)
+        self.events_applied = self._snapshot_applied = snapshot.get("eventsApplied", 0)
+        policies = [Policy(**p) for p in snapshot.get("policies", [])]
+        if policies:
+            self.book.apply_delta(None, upserts=policies)
+        logger.info(f"Restored {len(policies)} policies from snapshot at offset {self.offset}")
+
+    def save_checkpoint(self, snapshot: bool = False):
+        """Writes the offset; with `snapshot` (and no book storage) also the full book."""
+        self._write_json(self.checkpoint_path, {
+            "offset": self.offset,
+            "eventsApplied": self.events_applied,
+            "version": self.book.version,
+        })
+        if snapshot and self.book.storage is None:
+            self._write_json(self.snapshot_path, {
+                "offset": self.offset,
+                "eventsApplied": self.events_applied,
+                "policies": [p.model_dump() for p in self.book.policies()],
+            })
+            self._snapshot_applied = self.events_applied
+            self._snapshot_time = time.monotonic()
+
+    def _snapshot_due(self) -> bool:
+        return (
+            self.events_applied - self._snapshot_applied >= self.snapshot_events
+            or time.monotonic() - self._snapshot_time >= self.snapshot_seconds
+        )
+
+    def run_once(self) -> int:
+        """
+        Catches up with the log from the current offset, then checkpoints (and snapshots when due).
+        A trailing line without a newline is treated as still being written and left for later.
+        Returns the number of events applied.
+        """
+        with self._lock:
+            return self._catch_up()
+
+    def _catch_up(self) -> int:
+        if not os.path.exists(self.log_path):
+            return 0
+
+        applied = 0
+        skipped = self.events_skipped
+        batch = []
+        with open(self.log_path, "rb") as f:
+            f.seek(self.offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                batch.append(line)
+                if len(batch) >= self.batch_size:
+                    applied += self._apply_batch(batch)
+                    batch = []
+            if batch:
+                applied += self._apply_batch(batch)
+
+        if applied or self.events_skipped != skipped:
+            self.save_checkpoint(snapshot=self._snapshot_due())
+        if applied:
+            logger.info(f"Applied {applied} contract events (offset {self.offset}, book v{self.book.version})")
+        return applied
+
+    def _apply_batch(self, lines) -> int:
+        # Working copies of every policy touched in this batch, as plain dicts
+        pending: Dict[str, dict] = {}
+        # Events folded into each pending policy, so an invalid policy skips all of them
+        folded: Dict[str, int] = {}
+        applied = 0
+        skipped = 0
+        offset = self.offset
+
+        for line in lines:
+            offset += len(line)
+            try:
+                event = json.loads(line)
+                self._apply_event(event, pending)
+                folded[event["hash"]] = folded.get(event["hash"], 0) + 1
+                applied += 1
+            except (ValueError, KeyError, TypeError) as e:
+                skipped += 1
+                self._log_skip(skipped, offset, e)
+
+        upserts = []
+        for policy_hash, fields in pending.items():
+            try:
+                upserts.append(Policy(**fields))
+            except ValidationError as e:
+                applied -= folded[policy_hash]
+                skipped += folded[policy_hash]
+                self._log_skip(skipped, offset, e)
+
+        if upserts:
+            self.book.apply_delta(None, upserts=upserts, source_offset=offset)
+        self.offset = offset
+        self.events_applied += applied
+        self.events_skipped += skipped
+        return applied
+
+    def _log_skip(self, skipped: int, offset: int, error: Exception):
+        if self.events_skipped + skipped <= 10:
+            logger.warning(f"Skipping malformed contract event before offset {offset}: {error}")
+
+    def _apply_event(self, event: dict, pending: Dict[str, dict]):
+        kind = event["event"]
+        policy_hash = event["hash"]
+
+        if kind == "PolicyCreated":
+            pending[policy_hash] = {
+                "policyHash": policy_hash,
+                "policyName": event.get("policyName", ""),
+                "policyType": event.get("policyType", ""),
+                "coverageAmount": int(event.get("coverageAmount", 0)),
+                "premium": int(event.get("premium", 0)),
+                "startTime": int(event.get("timestamp", 0)),
+                "duration": int(event.get("durationInDays", 0)) * SECONDS_PER_DAY,
+                "renewalCount": 0,
+                "notes": event.get("notes", ""),
+                "status": STATUS_PENDING,
+                "customer": event.get("customer", ""),
+            }
+            return
+
+        # Every field is parsed before the policy is touched, so a bad event changes nothing
+        if kind == "PolicySigned":
+            start_time = int(event["timestamp"]) if "timestamp" in event else None
+        elif kind == "PolicyRenewed":
+            additional = int(event.get("additionalDays", 0)) * SECONDS_PER_DAY
+            renewal_count = int(event["renewalCount"]) if "renewalCount" in event else None
+        elif kind != "PolicyExpired":
+            raise ValueError(f"Unknown event type: {kind}")
+
+        policy = pending.get(policy_hash)
+        if policy is None:
+            existing = self.book.get(policy_hash)
+            if existing is None:
+                raise KeyError(f"{kind} for unknown policy {policy_hash}")
+            policy = pending[policy_hash] = dict(existing.__dict__)
+
+        if kind == "PolicySigned":
+            policy["status"] = STATUS_ACTIVE
+            if start_time is not None:
+                policy["startTime"] = start_time
+        elif kind == "PolicyRenewed":
+            policy["duration"] += additional
+            policy["renewalCount"] = policy["renewalCount"] + 1 if renewal_count is None else renewal_count
+            policy["status"] = STATUS_ACTIVE
+        else:
+            policy["status"] = STATUS_EXPIRED
+
+    async def tail(self, poll_seconds: float = 1.0):
+        """Follows the log forever, sleeping only when there is nothing new."""
+        while True:
+            try:
+                applied = await asyncio.to_thread(self.run_once)
+            except Exception as e:
+                logger.error(f"Contract event ingestion failed: {e}")
+                applied = 0
+            if not applied:
+                await asyncio.sleep(poll_seconds)
+
+
+_ingestor: Optional[ContractEventIngestor] = None
+
+def get_event_ingestor() -> Optional[ContractEventIngestor]:
+    """Returns the ingestor configured by CONTRACT_EVENT_LOG, or None when ingestion is disabled."""
+    global _ingestor
+    if _ingestor is None and settings.CONTRACT_EVENT_LOG:
+        _ingestor = ContractEventIngestor(
+            books.get_or_create(settings.CONTRACT_EVENT_BOOK_ID),
+            settings.CONTRACT_EVENT_LOG,
+            settings.CONTRACT_EVENT_CHECKPOINT,
+            settings.CONTRACT_EVENT_BATCH_SIZE,
+            settings.CONTRACT_EVENT_SNAPSHOT_EVENTS,
+            settings.CONTRACT_EVENT_SNAPSHOT_SECONDS,
+        )
+    return _ingestor
@@ -1,39 +1,123 @@
 import logging
 import csv
 import io
-from typing import Dict, List, Optional
+import re
+import time
 from datetime import datetime
-from app.models.domain import CSVRenewalData
+from operator import attrgetter
+from typing import Dict, List, Optional, Tuple
+from pydantic import ValidationError
+from app.models.domain import CSVRenewalData, InsurancePlacement, EmailActivity, CalendarActivity, IngestFileReport
+from app.services.placements import PlacementRow, STORED_FIELDS
+from app.services.rejects import RejectTracker
 
 logger = logging.getLogger(__name__)
 
+PLACEMENT_FLOAT_FIELDS = {
+    "limit", "coveragePremiumAmount", "triaPremium", "totalPremium",
+    "commissionPercent", "commissionAmount", "participationPercentage",
+}
+# Placement export headers that don't reduce to the field name (note the export's "Comission" spelling)
+PLACEMENT_HEADER_ALIASES = {
+    "comission": "commissionPercent",
+    "commission": "commissionPercent",
+    "comissionamount": "commissionAmount",
+}
+PLACEMENT_HEADER_MAP = {field.lower(): field for field in InsurancePlacement.model_fields}
+PLACEMENT_HEADER_MAP.update(PLACEMENT_HEADER_ALIASES)
+
+EMAIL_HEADER_MAP = {
+    "email_id": "emailId", "subject": "subject", "client_name": "clientName",
+    "received_at": "receivedAt", "policy_id": "policyId", "summary": "summary",
+    "sentiment": "sentiment", "thread_count": "threadCount", "source_link": "sourceLink",
+}
+# Record model each upload kind parses into, and the fields its plain-tuple rows carry
+RECORD_MODELS = {
+    "renewal": CSVRenewalData,
+    "email": EmailActivity,
+    "calendar": CalendarActivity,
+    "placement": InsurancePlacement,
+}
+ROW_FIELDS = {kind: list(model.model_fields) for kind, model in RECORD_MODELS.items()}
+ROW_FIELDS["placement"] = STORED_FIELDS
+
+CALENDAR_HEADER_MAP = {
+    "event_id": "eventId", "title": "title", "client_name": "clientName",
+    "meeting_date": "meetingDate", "policy_id": "policyId", "meeting_notes": "meetingNotes",
+    "participants": "participants", "source_link": "sourceLink",
+}
+
 class IngestionService:
     @staticmethod
-    def parse_csv_content(content: str) -> List[CSVRenewalData]:
+    def parse_upload(kind: str, filename: Optional[str], content: bytes):
+        """
+        Decodes and parses one uploaded file of the given kind ("renewal", "email",
+        "calendar" or "placement"). Top-level and picklable so it can run in a worker process.
+        Returns (rows, report, reject tracker). Rows are validated records as plain tuples in
+        ROW_FIELDS order: they cross the process boundary several times faster than pydantic
+        models; use records_from_rows on the receiving side.
+        """
+        parsers = {
+            "renewal": IngestionService.parse_csv_content,
+            "email": IngestionService.parse_email_csv,
+            "calendar": IngestionService.parse_calendar_csv,
+            "placement": IngestionService.parse_placement_csv,
+        }
+        started = time.perf_counter()
+        report = IngestFileReport(kind=kind, filename=filename)
+        rejects = RejectTracker(source=kind)
+        records = parsers[kind](content.decode("utf-8-sig"), report, rejects)
+        rows = list(map(attrgetter(*ROW_FIELDS[kind]), records))
+        report.seconds = round(time.perf_counter() - started, 4)
+        return rows, report, rejects
+
+    @staticmethod
+    def records_from_rows(kind: str, rows: List[tuple]) -> list:
+        """
+        Records for rows returned by parse_upload, without validating them again.
+        Placements become PlacementRows (attribute access only); other kinds become models.
+        """
+        if kind == "placement":
+            return list(map(PlacementRow._make, rows))
+        model = RECORD_MODELS[kind]
+        fields = ROW_FIELDS[kind]
+        return [model.model_construct(**dict(zip(fields, row))) for row in rows]
+
+    @staticmethod
+    def parse_csv_content(
+        content: str,
+        report: Optional[IngestFileReport] = None,
+        rejects: Optional[RejectTracker] = None
+    ) -> List[CSVRenewalData]:
         """
         Parses CSV content with fault tolerance.
         - Handles BOM (Byte Order Mark) quirks
         - Normalizes headers to snake_case or camelCase variations
         - Skips empty lines
-        - Logs malformed rows instead of crashing
+        - Records malformed rows and dropped cells in `rejects` instead of crashing
+        - Fills row/accepted/rejected counts into `report` when given
         """
         results = []
+        rows = 0
         if not content:
             return results
+        rejects = rejects if rejects is not None else RejectTracker(source="renewal")
 
         try:
             # Use Python's built-in CSV reader for better parsing (handling quotes, etc.)
-            f = io.StringIO(content.strip())
-            reader = csv.DictReader(f)
+            text, skipped_lines = IngestionService._csv_text(content)
+            reader = csv.DictReader(io.StringIO(text))
             
             if not reader.fieldnames:
                 return results
+            rejects.headers = list(reader.fieldnames)
 
             # Create a normalized header map
             # e.g. "Policy Hash" -> "policyHash", "Claims Count" -> "claimsCount"
             header_map = IngestionService._build_header_map(reader.fieldnames)
             
             for row in reader:
+                rows += 1
                 try:
                     record_data = {}
                     policy_hash = None
@@ -45,25 +129,62 @@ class IngestionService:
                         if normalized_key == "policyHash":
                             policy_hash = value.strip()
                         elif normalized_key:
-                            IngestionService._coerce_and_set(record_data, normalized_key, value)
+                            if not IngestionService._coerce_and_set(record_data, normalized_key, value):
+                                rejects.cell_issue(reader.line_num + skipped_lines, normalized_key)
                             
                     if policy_hash:
                         record_data["policyHash"] = policy_hash
                         results.append(CSVRenewalData(**record_data))
+                    else:
+                        rejects.reject(reader.line_num + skipped_lines, "missing_policy_hash", IngestionService._raw_values(row))
                         
                 except Exception as row_err:
-                    logger.warning(f"Failed to parse row: {row}. Error: {row_err}")
+                    reason = "validation_error" if isinstance(row_err, ValidationError) else "malformed_row"
+                    rejects.reject(reader.line_num + skipped_lines, reason, IngestionService._raw_values(row), row_err)
                     continue
 
         except Exception as e:
             logger.error(f"Critical error parsing CSV: {e}")
             raise ValueError(f"Failed to parse CSV: {e}")
 
+        IngestionService._fill_report(report, rows, len(results), rejects)
         return results
 
     @staticmethod
-    def _coerce_and_set(data: dict, key: str, value: str):
-        """Helper to cast types safely."""
+    def _fill_report(report: Optional[IngestFileReport], rows: int, accepted: int, rejects: RejectTracker):
+        if report is not None:
+            report.rows = rows
+            report.accepted = accepted
+            report.rejected = rows - accepted
+            rejects.fill_report(report)
+
+    @staticmethod
+    def _csv_text(content: str) -> Tuple[str, int]:
+        """
+        (text, leading line count): content without BOM, surrounding whitespace and leading
+        blank lines. Add the count to a reader's line_num to get the line in the uploaded file.
+        """
+        text = content.lstrip("\ufeff").rstrip()
+        stripped = text.lstrip()
+        return stripped, text.count("\n", 0, len(text) - len(stripped))
+
+    @staticmethod
+    def _raw_values(row: dict) -> List[str]:
+        """Cell values of a DictReader row, including any surplus cells (stored under None)."""
+        values = []
+        for value in row.values():
+            if isinstance(value, list):
+                values.extend(value)
+            else:
+                values.append(value or "")
+        return values
+
+    @staticmethod
+    def _coerce_and_set(data: dict, key: str, value: str) -> bool:
+        """
+        Helper to cast types safely.
+        Returns False (leaving the field unset) when the cell can't be cast.
+        """
         value = value.strip()
         try:
             if key in ["claimsCount", "churnRisk"]:
@@ -73,9 +194,9 @@ class IngestionService:
             else:
                 data[key] = value
         except ValueError:
-            # Keep original or set default if casting fails? 
-            # For data integrity, better to skip or set None than crash
-            pass
+            # For data integrity, better to skip the cell than crash; the caller records it
+            return False
+        return True
 
     @staticmethod
     def _build_header_map(headers: List[str]) -> Dict[str, str]:
@@ -114,3 +235,134 @@ class IngestionService:
                 pass 
                 
         return mapping
+
+    @staticmethod
+    def parse_placement_csv(
+        content: str,
+        report: Optional[IngestFileReport] = None,
+        rejects: Optional[RejectTracker] = None
+    ) -> List[InsurancePlacement]:
+        """
+        Parses the placement export (one row per carrier placement).
+        - Headers like "Placement Created Date/Time" are matched to fields ignoring case and punctuation
+        - Monetary/percentage columns use "-" or blank for zero; other non-numbers reject the row
+        """
+        results = []
+        rows = 0
+        if not content:
+            return results
+        rejects = rejects if rejects is not None else RejectTracker(source="placement")
+
+        text, skipped_lines = IngestionService._csv_text(content)
+        reader = csv.reader(io.StringIO(text))
+        headers = next(reader, None)
+        if not headers:
+            return results
+        fields = [PLACEMENT_HEADER_MAP.get(re.sub(r"[^a-z0-9]", "", h.lower())) for h in headers]
+        rejects.headers = headers
+
+        for values in reader:
+            if not values: continue
+            rows += 1
+            try:
+                record = {}
+                for field, value in zip(fields, values):
+                    if not field: continue
+                    value = value.strip()
+                    if field in PLACEMENT_FLOAT_FIELDS:
+                        record[field] = float(value) if value and value != "-" else 0.0
+                    else:
+                        record[field] = value
+                for field in InsurancePlacement.model_fields:
+                    if field not in record and field not in ("daysUntilExpiry", "priorityScore"):
+                        record[field] = 0.0 if field in PLACEMENT_FLOAT_FIELDS else ""
+                results.append(InsurancePlacement(**record))
+            except ValueError as row_err:
+                # float() failures and pydantic ValidationError are both ValueErrors
+                reason = "validation_error" if isinstance(row_err, ValidationError) else "invalid_number"
+                rejects.reject(reader.line_num + skipped_lines, reason, values, row_err)
+                continue
+
+        IngestionService._fill_report(report, rows, len(results), rejects)
+        return results
+
+    @staticmethod
+    def parse_email_csv(
+        content: str,
+        report: Optional[IngestFileReport] = None,
+        rejects: Optional[RejectTracker] = None
+    ) -> List[EmailActivity]:
+        """Parses the email activity feed (email_data.csv)."""
+        results = []
+        rows = 0
+        rejects = rejects if rejects is not None else RejectTracker(source="email")
+        for line, values, record in IngestionService._iter_mapped_rows(content, EMAIL_HEADER_MAP, rejects):
+            rows += 1
+            try:
+                if "threadCount" in record:
+                    record["threadCount"] = int(record["threadCount"] or 0)
+                results.append(EmailActivity(**record))
+            except ValueError as row_err:
+                reason = "validation_error" if isinstance(row_err, ValidationError) else "invalid_number"
+                rejects.reject(line, reason, values, row_err)
+        IngestionService._fill_report(report, rows, len(results), rejects)
+        return results
+
+    @staticmethod
+    def parse_calendar_csv(
+        content: str,
+        report: Optional[IngestFileReport] = None,
+        rejects: Optional[RejectTracker] = None
+    ) -> List[CalendarActivity]:
+        """
+        Parses the calendar feed (calendar_data.csv).
+        The export does not quote the comma-separated participants column, so any
+        surplus cells are folded back into participants.
+        """
+        results = []
+        rows = 0
+        rejects = rejects if rejects is not None else RejectTracker(source="calendar")
+        mapped = IngestionService._iter_mapped_rows(content, CALENDAR_HEADER_MAP, rejects, spill_field="participants")
+        for line, values, record in mapped:
+            rows += 1
+            try:
+                record["participants"] = [p.strip() for p in record.get("participants", "").split(",") if p.strip()]
+                results.append(CalendarActivity(**record))
+            except ValidationError as row_err:
+                rejects.reject(line, "validation_error", values, row_err)
+        IngestionService._fill_report(report, rows, len(results), rejects)
+        return results
+
+    @staticmethod
+    def _iter_mapped_rows(
+        content: str,
+        header_map: Dict[str, str],
+        rejects: RejectTracker,
+        spill_field: Optional[str] = None
+    ):
+        """
+        Yields (line number, raw cells, dict keyed by domain field) for each non-empty row.
+        Rows with more cells than headers have the surplus joined into `spill_field`.
+        """
+        if not content:
+            return
+        text, skipped_lines = IngestionService._csv_text(content)
+        reader = csv.reader(io.StringIO(text))
+        headers = next(reader, None)
+        if not headers:
+            return
+        fields = [header_map.get(h.strip().lower()) for h in headers]
+        rejects.headers = headers
+        spill_idx = fields.index(spill_field) if spill_field in fields else None
+
+        for raw in reader:
+            if not raw or not any(raw): continue
+            values = raw
+            extra = len(values) - len(fields)
+            if extra > 0 and spill_idx is not None:
+                values = (
+                    values[:spill_idx]
+                    + [",".join(values[spill_idx:spill_idx + extra + 1])]
+                    + values[spill_idx + extra + 1:]
+                )
+            yield reader.line_num + skipped_lines, raw, {field: value.strip() for field, value in zip(fields, values) if field}
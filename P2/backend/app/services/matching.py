@@ -0,0 +1,203 @@
+import hashlib
+import logging
+import re
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Dict, Iterable, List, Optional
+from app.models.domain import (
+    InsurancePlacement, EmailActivity, CalendarActivity, ClientActivityLink, ActivityLinkReport
+)
+
+logger = logging.getLogger(__name__)
+
+# Abbreviations expanded during normalization. Words like "Group" or "Corporation" are
+# kept: "Apex Group" and "Apex Corporation" are different clients in the placement data.
+ABBREVIATIONS = {
+    "corp": "corporation",
+    "inc": "incorporated",
+    "co": "company",
+    "ltd": "limited",
+    "intl": "international",
+    "tech": "technologies",
+    "assoc": "associates",
+    "&": "and",
+}
+# Legal-form words dropped on a second exact lookup ("Apex Enterprises Inc" -> "apex enterprises")
+LEGAL_FORMS = {"incorporated", "limited", "llc", "plc", "company"}
+NGRAM_SIZE = 3
+# Grams shared by more than this many clients are too common to narrow anything down
+MAX_POSTING_LENGTH = 500
+# How many matchers (one per distinct placement client set) we keep around
+MAX_CACHED_MATCHERS = 4
+
+
+def normalize_client_name(name: str) -> str:
+    """
+    Canonical form used as the client key, e.g. "Apex Corp." -> "apex corporation".
+    """
+    tokens = re.findall(r"[a-z0-9]+|&", name.lower())
+    return " ".join(ABBREVIATIONS.get(t, t) for t in tokens)
+
+
+def _ngrams(normalized: str) -> frozenset:
+    padded = f" {normalized} "
+    return frozenset(padded[i:i + NGRAM_SIZE] for i in range(len(padded) - NGRAM_SIZE + 1))
+
+
+class ClientMatcher:
+    """
+    Resolves free-form client names (email/calendar feeds) to placement client keys.
+    - Exact match on the normalized name first, then with legal-form words dropped
+    - Otherwise a character trigram blocking index yields candidates sharing grams with
+      the query; only those are scored (Dice coefficient on trigram sets), never the full list
+    - Results are cached per raw name, so repeated joins reuse the mapping
+    """
+
+    def __init__(self, client_names: Iterable[str], threshold: float = 0.8, max_candidates: int = 20):
+        self.threshold = threshold
+        self.max_candidates = max_candidates
+        self.display_names: Dict[str, str] = {}
+        self._grams: Dict[str, frozenset] = {}
+        self._index: Dict[str, List[str]] = defaultdict(list)
+        self._cache: Dict[str, Optional[str]] = {}
+        self._lock = threading.Lock()
+
+        for name in client_names:
+            key = normalize_client_name(name)
+            if not key or key in self.display_names:
+                continue
+            self.display_names[key] = name.strip()
+            grams = _ngrams(key)
+            self._grams[key] = grams
+            for gram in grams:
+                self._index[gram].append(key)
+
+    def __len__(self) -> int:
+        return len(self.display_names)
+
+    def resolve(self, name: str) -> Optional[str]:
+        """Client key for a free-form name, or None when nothing scores above the threshold."""
+        cached = self._cache.get(name, False)
+        if cached is not False:
+            return cached
+
+        key = normalize_client_name(name)
+        if key not in self.display_names:
+            stripped = " ".join(t for t in key.split() if t not in LEGAL_FORMS)
+            if stripped in self.display_names:
+                key = stripped
+            else:
+                key = self._best_candidate(key) if key else None
+        with self._lock:
+            self._cache[name] = key
+        return key
+
+    def _best_candidate(self, normalized: str) -> Optional[str]:
+        grams = _ngrams(normalized)
+        overlap: Dict[str, int] = defaultdict(int)
+        for gram in grams:
+            posting = self._index.get(gram)
+            if not posting or len(posting) > MAX_POSTING_LENGTH:
+                continue
+            for key in posting:
+                overlap[key] += 1
+        if not overlap:
+            return None
+
+        # Overlap counts skip the common grams, so they only pick candidates; scoring
+        # intersects the full gram sets
+        candidates = sorted(overlap, key=overlap.get, reverse=True)[:self.max_candidates]
+        best_key, best_score = None, 0.0
+        for key in candidates:
+            # Dice coefficient on the trigram sets
+            candidate_grams = self._grams[key]
+            score = 2 * len(grams & candidate_grams) / (len(grams) + len(candidate_grams))
+            if score > best_score:
+                best_key, best_score = key, score
+        return best_key if best_score >= self.threshold else None
+
+    def mapping(self) -> Dict[str, Optional[str]]:
+        """Raw name -> client key for every name resolved so far."""
+        with self._lock:
+            return dict(self._cache)
+
+
+_matchers: "OrderedDict[str, ClientMatcher]" = OrderedDict()
+_matchers_lock = threading.Lock()
+
+def get_client_matcher(client_names: Iterable[str]) -> ClientMatcher:
+    """
+    Returns a matcher for this set of placement clients, reusing a cached one
+    (with its resolved-name mapping) when the same client set was seen before.
+    """
+    names = sorted({n.strip() for n in client_names if n and n.strip()})
+    fingerprint = hashlib.sha1("\n".join(names).encode("utf-8")).hexdigest()
+    with _matchers_lock:
+        matcher = _matchers.pop(fingerprint, None)
+        if matcher is None:
+            matcher = ClientMatcher(names)
+            logger.info(f"Built client matcher for {len(matcher)} clients")
+        _matchers[fingerprint] = matcher
+        while len(_matchers) > MAX_CACHED_MATCHERS:
+            _matchers.popitem(last=False)
+    return matcher
+
+
+def link_client_activity(
+    placements: List[InsurancePlacement],
+    emails: List[EmailActivity],
+    meetings: List[CalendarActivity]
+) -> ActivityLinkReport:
+    """
+    Groups placements, emails and meetings under a shared client key.
+    Activity whose client name does not resolve is reported instead of guessed.
+    """
+    placement_ids: Dict[str, List[str]] = defaultdict(list)
+    for placement in placements:
+        placement_ids[placement.client].append(placement.placementId)
+    return link_activity(placement_ids, emails, meetings)
+
+
+def link_activity(
+    placement_ids: Dict[str, List[str]],
+    emails: List[EmailActivity],
+    meetings: List[CalendarActivity]
+) -> ActivityLinkReport:
+    """
+    link_client_activity over raw placement client names -> placement ids, so a caller
+    holding the columnar store can pass the client dictionary instead of decoded rows
+    (with empty id lists when only the link counts are needed).
+    """
+    matcher = get_client_matcher(placement_ids)
+    links: Dict[str, ClientActivityLink] = {}
+    for client, ids in placement_ids.items():
+        key = matcher.resolve(client)
+        if key is None: continue
+        link = links.get(key)
+        if link is None:
+            link = links[key] = ClientActivityLink(
+                clientKey=key, clientName=matcher.display_names[key], placementIds=[]
+            )
+        link.placementIds.extend(ids)
+
+    unmatched_emails = []
+    for email in emails:
+        key = matcher.resolve(email.clientName)
+        if key in links:
+            links[key].emails.append(email)
+        else:
+            unmatched_emails.append(email.clientName)
+
+    unmatched_meetings = []
+    for meeting in meetings:
+        key = matcher.resolve(meeting.clientName)
+        if key in links:
+            links[key].meetings.append(meeting)
+        else:
+            unmatched_meetings.append(meeting.clientName)
+
+    return ActivityLinkReport(
+        clients=sorted(links.values(), key=lambda l: l.clientName),
+        unmatchedEmails=unmatched_emails,
+        unmatchedMeetings=unmatched_meetings,
+    )
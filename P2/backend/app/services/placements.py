@@ -0,0 +1,394 @@
+import logging
+import threading
+from array import array
+from collections import namedtuple
+from datetime import date, datetime
+from itertools import compress
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from app.models.domain import InsurancePlacement, PortfolioRollup, PortfolioRollupRow
+
+logger = logging.getLogger(__name__)
+
+# Dimensions the rollup cube is keyed by (InsurancePlacement field names)
+ROLLUP_DIMENSIONS = ["carrierGroup", "productLine", "placementSpecialist", "placementClientSegmentCode"]
+# Date formats seen in placement exports ("30/09/26" in the scrambled sample)
+PLACEMENT_DATE_FORMATS = ["%d/%m/%y", "%d/%m/%Y", "%Y-%m-%d"]
+NO_EXPIRY = -1
+# Code widths tried in order as a column's dictionary grows (1, 2, 4 bytes per row)
+CODE_TYPECODES = ["B", "H", "I"]
+# Computed fields are not stored; they are filled per request
+COMPUTED_FIELDS = {"daysUntilExpiry", "priorityScore"}
+NUMERIC_FIELDS = [
+    name for name, field in InsurancePlacement.model_fields.items()
+    if field.annotation is float and name not in COMPUTED_FIELDS
+]
+STRING_FIELDS = [
+    name for name in InsurancePlacement.model_fields
+    if name not in NUMERIC_FIELDS and name not in COMPUTED_FIELDS
+]
+STORED_FIELDS = [name for name in InsurancePlacement.model_fields if name not in COMPUTED_FIELDS]
+# Validated placement without the pydantic model, for bulk paths that only read attributes
+# (store upserts, persistence, client linking); built from plain tuples in STORED_FIELDS order
+PlacementRow = namedtuple("PlacementRow", STORED_FIELDS)
+
+
+def placement_row_key(placement: InsurancePlacement) -> Tuple[str, str]:
+    """
+    Identity of a placement row. The export has one row per participating carrier,
+    so placementId alone is not unique; re-sent rows with the same key are upserts.
+    """
+    return (placement.placementId, placement.carrierGroupLocalId)
+
+
+def typecode_of(buffer) -> str:
+    """array typecode of an array or of a memoryview cast over a mapped file."""
+    return getattr(buffer, "typecode", None) or buffer.format
+
+
+def parse_placement_date(value: str) -> Optional[date]:
+    value = (value or "").strip()
+    if not value or value == "-":
+        return None
+    for fmt in PLACEMENT_DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+class CategoricalColumn:
+    """
+    Dictionary-encoded string column: each distinct value is stored once and rows hold
+    a small integer code. Codes are stable for the column's lifetime, so they can be
+    compared and grouped on directly and decoded only when a response is rendered.
+    Codes start as one byte per row and widen when the dictionary outgrows them.
+    `values`/`codes` may also be read-only views over a shared table (see services.shared).
+    """
+
+    def __init__(self, values: Optional[Sequence[str]] = None, codes=None):
+        self.values = values if values is not None else []
+        self.codes = codes if codes is not None else array("B")
+        self._index: Optional[Dict[str, int]] = None
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def _value_index(self) -> Dict[str, int]:
+        if self._index is None:
+            self._index = {value: code for code, value in enumerate(self.values)}
+        return self._index
+
+    def encode(self, value: str) -> int:
+        index = self._value_index()
+        code = index.get(value)
+        if code is None:
+            code = index[value] = len(self.values)
+            self.values.append(value)
+            if code >= 1 << (8 * self.codes.itemsize):
+                self.codes = array(CODE_TYPECODES[CODE_TYPECODES.index(self.codes.typecode) + 1], self.codes)
+        return code
+
+    def append(self, value: str):
+        code = self.encode(value)
+        self.codes.append(code)
+
+    def set(self, row: int, value: str):
+        code = self.encode(value)
+        self.codes[row] = code
+
+    def lookup(self, value: str) -> Optional[int]:
+        """Code of a value, or None when no row ever had it (nothing can match)."""
+        return self._value_index().get(value)
+
+    def decode(self, code: int) -> str:
+        return self.values[code]
+
+    def mask(self, code: int) -> bytes:
+        """One byte per row, 1 where the row has `code` (byte columns are translated in C)."""
+        if self.codes.itemsize == 1:
+            table = bytearray(256)
+            table[code] = 1
+            return self.codes.tobytes().translate(table)
+        return bytes(map(code.__eq__, self.codes))
+
+    def nbytes(self) -> int:
+        return self.codes.itemsize * len(self.codes)
+
+
+class PlacementStore:
+    """
+    Server-held placements, stored column-wise, plus a rollup cube maintained at ingest time.
+    - String fields are CategoricalColumns (carrier groups, product lines, status and segment
+      codes, specialists repeat across most rows); numbers are float arrays
+    - Rows are keyed by placement_row_key; removal moves the last row into the freed slot
+      so the columns stay dense
+    - The cube is keyed by (carrier, product line, specialist, segment codes, expiry date ordinal)
+      and holds [count, total premium, commission]; upserts subtract the old row first
+    - Filters and rollups compare codes; strings are decoded only for the rows/groups returned
+    - A read-only store can sit directly on mapped columns (`from_columns`); `copy()` gives a
+      writable one
+    """
+
+    def __init__(self):
+        self.read_only = False
+        self._rows: Dict[Tuple[str, str], int] = {}
+        self._keys: List[Tuple[str, str]] = []
+        self._strings: Dict[str, CategoricalColumn] = {f: CategoricalColumn() for f in STRING_FIELDS}
+        self._numbers: Dict[str, array] = {f: array("d") for f in NUMERIC_FIELDS}
+        # Expiry ordinal per placementExpiryDate code, so each distinct date is parsed once
+        self._expiry_ordinals: List[int] = []
+        self._cube: Dict[Tuple, List[float]] = {}
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_columns(
+        cls,
+        strings: Dict[str, CategoricalColumn],
+        numbers: Dict[str, Sequence[float]],
+        cube: Optional[Dict[Tuple, List[float]]] = None
+    ) -> "PlacementStore":
+        """Read-only store over existing columns; the rollup cube is rebuilt unless given."""
+        store = cls()
+        store._strings = strings
+        store._numbers = numbers
+        store.read_only = True
+        if cube is not None:
+            store._cube = cube
+        else:
+            for row in range(len(store)):
+                store._add_to_cube(row, 1)
+        return store
+
+    def copy(self) -> "PlacementStore":
+        """Writable copy, e.g. of a mapped read-only store that is about to be updated."""
+        with self._lock:
+            store = PlacementStore()
+            store._strings = {
+                field: CategoricalColumn(list(column.values), array(typecode_of(column.codes), column.codes))
+                for field, column in self._strings.items()
+            }
+            store._numbers = {field: array("d", values) for field, values in self._numbers.items()}
+            ids, carriers = store._strings["placementId"], store._strings["carrierGroupLocalId"]
+            store._keys = [
+                (ids.values[ids.codes[row]], carriers.values[carriers.codes[row]]) for row in range(len(self))
+            ]
+            store._rows = {key: row for row, key in enumerate(store._keys)}
+            store._expiry_ordinals = list(self._expiry_ordinals)
+            store._cube = {key: list(cell) for key, cell in self._cube.items()}
+            return store
+
+    def columns(self) -> Tuple[Dict[str, CategoricalColumn], Dict[str, Sequence[float]]]:
+        return self._strings, self._numbers
+
+    def cube(self) -> Dict[Tuple, List[float]]:
+        """Rollup cells: (dimension codes..., expiry ordinal) -> [count, premium, commission]."""
+        with self._lock:
+            return {key: list(cell) for key, cell in self._cube.items()}
+
+    def __len__(self) -> int:
+        return len(self._strings["placementId"].codes)
+
+    def client_names(self) -> List[str]:
+        """Distinct clients with at least one row, decoded from the dictionary (no rows built)."""
+        with self._lock:
+            column = self._strings["client"]
+            return [column.values[code] for code in set(column.codes)]
+
+    def placements(self) -> List[InsurancePlacement]:
+        with self._lock:
+            return [self._decode_row(i) for i in range(len(self))]
+
+    def select(self, filters: Dict[str, str], limit: Optional[int] = None) -> List[InsurancePlacement]:
+        """
+        Placements whose string fields equal the given values, e.g.
+        {"participationStatusCode": "QUOTATION_STATUS_QUOTED"}. Matching is done on codes.
+        """
+        unknown = [f for f in filters if f not in self._strings]
+        if unknown:
+            raise ValueError(f"Unknown placement field(s): {unknown}")
+        with self._lock:
+            n = len(self)
+            # Per-filter 0/1 byte masks are ANDed as big integers, then expanded to row numbers
+            mask = None
+            for field, value in filters.items():
+                column = self._strings[field]
+                code = column.lookup(value)
+                if code is None:
+                    return []
+                bits = int.from_bytes(column.mask(code), "little")
+                mask = bits if mask is None else mask & bits
+            rows = list(range(n)) if mask is None else list(compress(range(n), mask.to_bytes(n, "little")))
+            if limit is not None:
+                rows = rows[:limit]
+            return [self._decode_row(i) for i in rows]
+
+    def _check_writable(self):
+        if self.read_only:
+            raise RuntimeError("Placement store is a read-only shared snapshot; update a copy()")
+
+    def upsert(self, placements: Iterable[InsurancePlacement]) -> int:
+        self._check_writable()
+        count = 0
+        with self._lock:
+            for placement in placements:
+                key = placement_row_key(placement)
+                row = self._rows.get(key)
+                if row is None:
+                    row = len(self._keys)
+                    self._keys.append(key)
+                    self._rows[key] = row
+                    for field, column in self._strings.items():
+                        column.append(getattr(placement, field))
+                    for field, values in self._numbers.items():
+                        values.append(getattr(placement, field))
+                else:
+                    self._add_to_cube(row, -1)
+                    for field, column in self._strings.items():
+                        column.set(row, getattr(placement, field))
+                    for field, values in self._numbers.items():
+                        values[row] = getattr(placement, field)
+                self._add_to_cube(row, 1)
+                count += 1
+        return count
+
+    def remove(self, row_keys: Iterable[Tuple[str, str]]) -> int:
+        self._check_writable()
+        count = 0
+        with self._lock:
+            for key in row_keys:
+                row = self._rows.pop(tuple(key), None)
+                if row is None:
+                    continue
+                self._add_to_cube(row, -1)
+                last = len(self._keys) - 1
+                if row != last:
+                    moved = self._keys[last]
+                    self._keys[row] = moved
+                    self._rows[moved] = row
+                    for column in self._strings.values():
+                        column.codes[row] = column.codes[last]
+                    for values in self._numbers.values():
+                        values[row] = values[last]
+                self._keys.pop()
+                for column in self._strings.values():
+                    column.codes.pop()
+                for values in self._numbers.values():
+                    values.pop()
+                count += 1
+        return count
+
+    def clear(self):
+        self._check_writable()
+        with self._lock:
+            self._rows.clear()
+            self._keys.clear()
+            self._strings = {f: CategoricalColumn() for f in STRING_FIELDS}
+            self._numbers = {f: array("d") for f in NUMERIC_FIELDS}
+            self._expiry_ordinals.clear()
+            self._cube.clear()
+
+    def nbytes(self) -> int:
+        """Approximate size of the column arrays (excluding dictionaries and row keys)."""
+        with self._lock:
+            return (
+                sum(c.nbytes() for c in self._strings.values())
+                + sum(v.itemsize * len(v) for v in self._numbers.values())
+            )
+
+    def _decode_row(self, row: int) -> InsurancePlacement:
+        record = {field: column.values[column.codes[row]] for field, column in self._strings.items()}
+        for field, values in self._numbers.items():
+            record[field] = values[row]
+        return InsurancePlacement(**record)
+
+    def _expiry_ordinal(self, code: int) -> int:
+        ordinals = self._expiry_ordinals
+        column = self._strings["placementExpiryDate"]
+        while len(ordinals) <= code:
+            expiry = parse_placement_date(column.values[len(ordinals)])
+            ordinals.append(expiry.toordinal() if expiry else NO_EXPIRY)
+        return ordinals[code]
+
+    def _cube_key(self, row: int) -> Tuple:
+        return tuple(self._strings[d].codes[row] for d in ROLLUP_DIMENSIONS) + (
+            self._expiry_ordinal(self._strings["placementExpiryDate"].codes[row]),
+        )
+
+    def _add_to_cube(self, row: int, sign: int):
+        key = self._cube_key(row)
+        cell = self._cube.get(key)
+        if cell is None:
+            cell = self._cube[key] = [0, 0.0, 0.0]
+        cell[0] += sign
+        cell[1] += sign * self._numbers["totalPremium"][row]
+        cell[2] += sign * self._numbers["commissionAmount"][row]
+        if cell[0] == 0:
+            del self._cube[key]
+
+    def rollup(
+        self,
+        group_by: List[str],
+        filters: Optional[Dict[str, str]] = None,
+        expiry_from_days: Optional[int] = None,
+        expiry_to_days: Optional[int] = None,
+        expiring_within_days: int = 90,
+        today: Optional[date] = None
+    ) -> PortfolioRollup:
+        """
+        Group-by over the cube; filter values are encoded once and group keys decoded per output row.
+        - `filters` pins dimensions to a value (e.g. {"carrierGroup": "Liberty Insurance Group"})
+        - `expiry_from_days`/`expiry_to_days` restrict to placements expiring in that window from today
+        - `expiringCount` counts placements expiring within `expiring_within_days` from today
+        """
+        unknown = [d for d in list(group_by) + list(filters or {}) if d not in ROLLUP_DIMENSIONS]
+        if unknown:
+            raise ValueError(f"Unknown rollup dimension(s): {unknown}. Use {ROLLUP_DIMENSIONS}")
+
+        today_ord = (today or date.today()).toordinal()
+        group_idx = [ROLLUP_DIMENSIONS.index(d) for d in group_by]
+        lo = today_ord + expiry_from_days if expiry_from_days is not None else None
+        hi = today_ord + expiry_to_days if expiry_to_days is not None else None
+        expiring_hi = today_ord + expiring_within_days
+
+        groups: Dict[Tuple, List[float]] = {}
+        with self._lock:
+            filter_idx = [(ROLLUP_DIMENSIONS.index(d), self._strings[d].lookup(v)) for d, v in (filters or {}).items()]
+            # A filter value no row has can never match
+            cells = list(self._cube.items()) if all(code is not None for _, code in filter_idx) else []
+            columns = [self._strings[d] for d in group_by]
+
+        for key, (count, premium, commission) in cells:
+            if any(key[i] != v for i, v in filter_idx):
+                continue
+            expiry = key[4]
+            if (lo is not None or hi is not None) and expiry == NO_EXPIRY:
+                continue
+            if lo is not None and expiry < lo: continue
+            if hi is not None and expiry > hi: continue
+
+            group_key = tuple(key[i] for i in group_idx)
+            agg = groups.get(group_key)
+            if agg is None:
+                agg = groups[group_key] = [0, 0.0, 0.0, 0]
+            agg[0] += count
+            agg[1] += premium
+            agg[2] += commission
+            if expiry != NO_EXPIRY and today_ord <= expiry <= expiring_hi:
+                agg[3] += count
+
+        rows = [
+            PortfolioRollupRow(
+                group={d: column.decode(code) for d, column, code in zip(group_by, columns, group_key)},
+                placementCount=int(agg[0]),
+                totalPremium=round(agg[1], 2),
+                commissionAmount=round(agg[2], 2),
+                expiringCount=int(agg[3]),
+            )
+            for group_key, agg in groups.items()
+        ]
+        rows.sort(key=lambda r: r.totalPremium, reverse=True)
+        return PortfolioRollup(groupBy=list(group_by), expiringWithinDays=expiring_within_days, rows=rows)
+
+
+placement_store = PlacementStore()
@@ -0,0 +1,111 @@
+import csv
+import io
+import logging
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Tuple
+from app.models.domain import IngestFileReport
+
+logger = logging.getLogger(__name__)
+
+# Rows kept for the quarantine file per upload; further rejects are only counted
+MAX_QUARANTINE_ROWS = 10000
+# Log lines per reason before switching to one summary line per interval
+LOG_FIRST_PER_REASON = 3
+LOG_INTERVAL_SECONDS = 10.0
+# Quarantine reports kept in memory for download
+MAX_QUARANTINE_REPORTS = 50
+
+
+class RejectTracker:
+    """
+    Structured accounting for rows and cells an ingest could not use.
+    - Per-reason counters for rejected rows and for dropped cells (row kept, bad cell skipped)
+    - Sampled logging: the first few rejects per reason, then one summary line per interval,
+      never the full row
+    - Rejected rows are kept with their line number for a downloadable quarantine CSV
+    Only the reject paths call into the tracker; clean rows never touch it.
+    """
+
+    def __init__(self, source: str = "csv", headers: Optional[List[str]] = None):
+        self.source = source
+        self.headers = headers or []
+        self.reasons: Counter = Counter()
+        self.cell_issues: Counter = Counter()
+        self.rows: List[Tuple[int, str, List[str]]] = []
+        self._suppressed: Counter = Counter()
+        self._last_log: Dict[str, float] = {}
+
+    @property
+    def rejected(self) -> int:
+        return sum(self.reasons.values())
+
+    def reject(self, line: int, reason: str, values: List[str], error: Optional[Exception] = None):
+        self.reasons[reason] += 1
+        if len(self.rows) < MAX_QUARANTINE_ROWS:
+            self.rows.append((line, reason, values))
+        if self._should_log(reason, self.reasons[reason]):
+            detail = f" ({error})" if error else ""
+            self._log(reason, f"Rejected {self.source} row at line {line}: {reason}{detail}")
+
+    def cell_issue(self, line: int, field: str):
+        reason = f"invalid_{field}"
+        self.cell_issues[reason] += 1
+        if self._should_log(reason, self.cell_issues[reason]):
+            self._log(reason, f"Dropped invalid {field} in {self.source} row at line {line}")
+
+    def _should_log(self, reason: str, seen: int) -> bool:
+        if seen <= LOG_FIRST_PER_REASON:
+            self._last_log[reason] = time.monotonic()
+            return True
+        self._suppressed[reason] += 1
+        return time.monotonic() - self._last_log[reason] >= LOG_INTERVAL_SECONDS
+
+    def _log(self, reason: str, message: str):
+        suppressed = self._suppressed[reason]
+        if suppressed > 1:
+            message += f" (+{suppressed - 1} similar since last log)"
+        logger.warning(message)
+        self._last_log[reason] = time.monotonic()
+        self._suppressed[reason] = 0
+
+    def fill_report(self, report: Optional[IngestFileReport]):
+        if report is not None:
+            report.rejectReasons = dict(self.reasons)
+            report.cellIssues = dict(self.cell_issues)
+
+    def to_csv(self) -> str:
+        out = io.StringIO()
+        writer = csv.writer(out)
+        writer.writerow(["line", "reason"] + self.headers)
+        for line, reason, values in self.rows:
+            writer.writerow([line, reason] + values)
+        return out.getvalue()
+
+
+class QuarantineStore:
+    """Keeps the most recent reject trackers so their quarantine files can be downloaded."""
+
+    def __init__(self, max_reports: int = MAX_QUARANTINE_REPORTS):
+        self.max_reports = max_reports
+        self._reports: "OrderedDict[str, RejectTracker]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, tracker: RejectTracker) -> Optional[str]:
+        """Stores a tracker that rejected something; returns its id (None if nothing to keep)."""
+        if not tracker.rows:
+            return None
+        quarantine_id = uuid.uuid4().hex
+        with self._lock:
+            self._reports[quarantine_id] = tracker
+            while len(self._reports) > self.max_reports:
+                self._reports.popitem(last=False)
+        return quarantine_id
+
+    def get(self, quarantine_id: str) -> Optional[RejectTracker]:
+        return self._reports.get(quarantine_id)
+
+
+quarantine_store = QuarantineStore()
@@ -1,14 +1,25 @@
 import math
 import time
 import logging
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
-from app.models.domain import Policy, PriorityFactors, PriorityWeights, CSVRenewalData
+from app.models.domain import (
+    Policy, PriorityFactors, PriorityWeights, CSVRenewalData, RenewalPipelineItem, ScoreBreakdown, ScoreBreakdownFactor
+)
 
 logger = logging.getLogger(__name__)
 
 # Constants
 SECONDS_PER_DAY = 86400
+# Renewal time windows (same buckets as the dashboard filter)
+TIME_WINDOWS = [
+    {"days": 180, "label": "6 Months", "color": "text-blue-400"},
+    {"days": 90, "label": "3 Months", "color": "text-yellow-400"},
+    {"days": 30, "label": "30 Days", "color": "text-orange-400"},
+    {"days": 7, "label": "7 Days", "color": "text-red-400"},
+]
+# Upper bound (days) of each urgency level, mirroring get_urgency_level
+URGENCY_LEVEL_DAYS = [("critical", 7), ("high", 30), ("medium", 90)]
 DEFAULT_WEIGHTS = PriorityWeights(
     premiumAtRisk=0.3,
     timeToExpiry=0.25,
@@ -16,6 +27,17 @@ DEFAULT_WEIGHTS = PriorityWeights(
     carrierResponsiveness=0.1,
     churnLikelihood=0.2,
 )
+# Display names of the priority factors, in PriorityFactors field order
+FACTOR_LABELS = {
+    "premiumAtRisk": "Premium at Risk",
+    "timeToExpiry": "Time to Expiry",
+    "claimsHistory": "Claims History",
+    "carrierResponsiveness": "Carrier Responsiveness",
+    "churnLikelihood": "Churn Likelihood",
+}
+# Factor scores (0-100) at or above / at or below which a factor is reported as raising / lowering priority
+HIGH_FACTOR_SCORE = 70
+LOW_FACTOR_SCORE = 30
 
 class ScoringService:
     @staticmethod
@@ -38,7 +60,19 @@ class ScoringService:
         return max(0, days_remaining)
 
     @staticmethod
-    def calculate_premium_score(policy: Policy, all_policies: List[Policy]) -> int:
+    def calculate_max_premium(all_policies: List[Policy]) -> float:
+        """
+        Largest positive premium in the book (0 if there is none).
+        Compute once per book and pass it to the scorers instead of rescanning per policy.
+        """
+        return max((float(p.premium) for p in all_policies if p.premium > 0), default=0.0)
+
+    @staticmethod
+    def calculate_premium_score(
+        policy: Policy,
+        all_policies: List[Policy],
+        max_premium: Optional[float] = None
+    ) -> int:
         """
         Calculates premium score using Logarithmic Normalization.
         This prevents massive outliers (e.g., one $10M policy) from squashing all other scores to 0.
@@ -47,14 +81,14 @@ class ScoringService:
             premium = float(policy.premium)
             if premium <= 0: return 0
 
-            # Get all premiums > 0 to avoid log(0)
-            valid_premiums = [float(p.premium) for p in all_policies if float(p.premium) > 0]
-            if not valid_premiums:
+            if max_premium is None:
+                max_premium = ScoringService.calculate_max_premium(all_policies)
+            if max_premium <= 0:
                 return 0
             
             # Log transform to handle wide variance in policy values
             log_premium = math.log10(premium)
-            max_log_premium = math.log10(max(valid_premiums))
+            max_log_premium = math.log10(max_premium)
             
             if max_log_premium == 0:
                 return 100
@@ -94,7 +128,8 @@ class ScoringService:
     def calculate_priority_factors(
         policy: Policy, 
         all_policies: List[Policy], 
-        csv_data: Optional[CSVRenewalData] = None
+        csv_data: Optional[CSVRenewalData] = None,
+        max_premium: Optional[float] = None
     ) -> PriorityFactors:
         
         days = ScoringService.calculate_days_until_expiry(policy)
@@ -119,7 +154,7 @@ class ScoringService:
                 churn_score = csv_data.churnRisk
 
         return PriorityFactors(
-            premiumAtRisk=ScoringService.calculate_premium_score(policy, all_policies),
+            premiumAtRisk=ScoringService.calculate_premium_score(policy, all_policies, max_premium),
             timeToExpiry=ScoringService.calculate_time_score(days),
             claimsHistory=claims_score,
             carrierResponsiveness=rating_score,
@@ -153,3 +188,115 @@ class ScoringService:
         ) / total_weight
         
         return int(round(max(0, min(100, score))))
+
+    @staticmethod
+    def build_pipeline(
+        policies: List[Policy],
+        csv_map: Optional[Dict[str, CSVRenewalData]] = None,
+        weights: Optional[PriorityWeights] = None,
+        max_premium: Optional[float] = None,
+        time_window_days: Optional[int] = None
+    ) -> List[RenewalPipelineItem]:
+        """
+        Scores every active policy and returns the pipeline sorted by score descending
+        (ties: earlier expiry first, then policy hash).
+        - `max_premium` defaults to the max over `policies`; pass the book-wide value
+          when scoring a subset so premium normalization stays consistent.
+        - `time_window_days` skips policies expiring later than the window before scoring them
+          (already-lapsed ones at 0 days are kept)
+        """
+        csv_map = csv_map or {}
+        weights = weights or DEFAULT_WEIGHTS
+        if max_premium is None:
+            max_premium = ScoringService.calculate_max_premium(policies)
+
+        pipeline = []
+        for policy in policies:
+            # Skip inactive policies
+            if policy.status != 1: continue
+
+            days = ScoringService.calculate_days_until_expiry(policy)
+            if time_window_days is not None and days > time_window_days:
+                continue
+
+            factors = ScoringService.calculate_priority_factors(
+                policy, policies, csv_map.get(policy.policyHash), max_premium
+            )
+            pipeline.append(RenewalPipelineItem(
+                policy=policy,
+                daysUntilExpiry=days,
+                priorityScore=ScoringService.calculate_total_score(factors, weights),
+                urgencyLevel=ScoringService.get_urgency_level(days),
+                factors=factors,
+                source=None # Simplified for API response
+            ))
+
+        # Ties go to the earlier expiry, then the hash: the same order SQLiteStore.ranked_pipeline uses
+        pipeline.sort(key=lambda x: (
+            -x.priorityScore, int(x.policy.startTime) + int(x.policy.duration), x.policy.policyHash
+        ))
+        return pipeline
+
+    @staticmethod
+    def describe_factor(
+        field: str,
+        policy: Policy,
+        days: int,
+        csv_data: Optional[CSVRenewalData] = None,
+        max_premium: Optional[float] = None
+    ) -> str:
+        if field == "premiumAtRisk":
+            text = f"${float(policy.premium):,.0f} premium"
+            return text + (f" (log-scaled against book max ${max_premium:,.0f})" if max_premium else "")
+        if field == "timeToExpiry":
+            if policy.status == 2: return "Policy has expired"
+            if policy.status == 0: return "Policy is pending"
+            return f"{days} days until expiry"
+        if field == "claimsHistory":
+            if csv_data and csv_data.claimsCount is not None:
+                return f"{csv_data.claimsCount} claims on record"
+            return "No claims data (default)"
+        if field == "carrierResponsiveness":
+            if csv_data and csv_data.carrierRating is not None:
+                return f"Carrier rated {csv_data.carrierRating:g}/5"
+            return "No carrier rating (default)"
+        if csv_data and csv_data.churnRisk is not None:
+            return f"{csv_data.churnRisk}% churn risk"
+        return "No churn data (default)"
+
+    @staticmethod
+    def explain_score(
+        policy: Policy,
+        factors: PriorityFactors,
+        weights: Optional[PriorityWeights] = None,
+        csv_data: Optional[CSVRenewalData] = None,
+        max_premium: Optional[float] = None
+    ) -> ScoreBreakdown:
+        """
+        Per-factor view of a priority score.
+        Each factor's `score`/`maxScore` are points out of the total (raw factor score times
+        its share of the weights), so the factor scores add up to the total up to rounding.
+        """
+        weights = weights or DEFAULT_WEIGHTS
+        days = ScoringService.calculate_days_until_expiry(policy)
+        total_weight = sum(getattr(weights, field) for field in FACTOR_LABELS)
+
+        breakdown = []
+        for field, label in FACTOR_LABELS.items():
+            raw = getattr(factors, field)
+            share = getattr(weights, field) / total_weight if total_weight > 0 else 0.0
+            if share == 0: impact = "neutral"
+            elif raw >= HIGH_FACTOR_SCORE: impact = "positive"
+            elif raw <= LOW_FACTOR_SCORE: impact = "negative"
+            else: impact = "neutral"
+            breakdown.append(ScoreBreakdownFactor(
+                name=label,
+                score=int(round(raw * share)),
+                maxScore=int(round(100 * share)),
+                description=ScoringService.describe_factor(field, policy, days, csv_data, max_premium),
+                impact=impact,
+                rawScore=raw,
+                weight=round(share, 4),
+            ))
+
+        return ScoreBreakdown(total=ScoringService.calculate_total_score(factors, weights), factors=breakdown)
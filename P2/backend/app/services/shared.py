@@ -0,0 +1,291 @@
+import contextlib
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+from array import array
+from collections.abc import Sequence
+from typing import IO, Dict, Iterable, Optional, Tuple
+from app.core.config import settings
+from app.models.domain import InsurancePlacement
+from app.services.placements import (
+    CategoricalColumn, PlacementStore, ROLLUP_DIMENSIONS, placement_store, typecode_of
+)
+from app.services.storage import get_storage
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, run a single worker there
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+PLACEMENT_TABLE = "placements"
+# Sections in a table file start on this boundary so they can be cast in place
+SECTION_ALIGNMENT = 8
+HEADER_LENGTH = struct.Struct("<Q")
+# Rollup cube cells are stored as flat arrays: key codes + expiry ordinal, and [count, premium, commission]
+CUBE_KEY_WIDTH = len(ROLLUP_DIMENSIONS) + 1
+CUBE_CELL_WIDTH = 3
+
+
+class MappedStrings(Sequence):
+    """Dictionary values stored as one UTF-8 blob plus an offsets array; decoded on access."""
+
+    def __init__(self, blob: memoryview, offsets: memoryview):
+        self._blob = blob
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, code: int) -> str:
+        return bytes(self._blob[self._offsets[code]:self._offsets[code + 1]]).decode("utf-8")
+
+
+class SharedTableStore:
+    """
+    Columnar tables published once into memory-mapped files and attached read-only by every
+    worker process, so N uvicorn workers share one copy through the OS page cache.
+    - Each publish writes `<name>.<generation>.tbl` and then swaps the `<name>.generation`
+      pointer with os.replace; readers see either the old or the new table, never a partial one
+    - Readers re-check the pointer per request (one small file read) and re-attach only when
+      the generation moved; a worker keeps serving its old mapping until then
+    - The rollup cube is published alongside the columns, so attaching costs O(cube cells),
+      not a pass over every row
+    - Writers serialize on a lock file, so concurrent uploads to different workers don't lose rows
+    - `claim` elects one process per directory for singletons such as the event ingestor
+    Used by the SHARED_WORKERS_EXPERIMENTAL launch mode; everything outside these tables
+    (books, streams, quarantine) is still per-process.
+    """
+
+    def __init__(self, directory: str, keep_generations: int = 2):
+        self.directory = directory
+        self.keep_generations = keep_generations
+        self._attached: Dict[str, Tuple[int, PlacementStore]] = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._claims: Dict[str, IO] = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, name: str, suffix: str) -> str:
+        return os.path.join(self.directory, f"{name}.{suffix}")
+
+    def generation(self, name: str) -> int:
+        try:
+            with open(self._path(name, "generation")) as f:
+                return int(f.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+
+    @contextlib.contextmanager
+    def writer(self, name: str):
+        """Cross-process write lock for a table (a no-op where fcntl is unavailable)."""
+        with self._write_lock, open(self._path(name, "lock"), "a") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def claim(self, name: str) -> bool:
+        """
+        Takes a non-blocking lock on `name` for the rest of the process's life. True in exactly
+        one process per directory (always True where fcntl is unavailable).
+        """
+        with self._write_lock:
+            if name in self._claims:
+                return True
+            handle = open(self._path(name, "claim"), "a")
+            if fcntl:
+                try:
+                    fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    handle.close()
+                    return False
+            self._claims[name] = handle
+            return True
+
+    def publish(self, name: str, store: PlacementStore) -> int:
+        """Writes the store's columns as a new generation and swaps readers over to it."""
+        generation = self.generation(name) + 1
+        strings, numbers = store.columns()
+
+        header = {"rows": len(store), "strings": {}, "numbers": {}}
+        sections = []
+        offset = 0
+
+        def add_section(data: bytes) -> list:
+            nonlocal offset
+            start = offset
+            sections.append(data)
+            offset += len(data)
+            padding = -offset % SECTION_ALIGNMENT
+            if padding:
+                sections.append(b"\0" * padding)
+                offset += padding
+            return [start, len(data)]
+
+        for field, column in strings.items():
+            encoded = [value.encode("utf-8") for value in column.values]
+            offsets = array("Q", [0])
+            for value in encoded:
+                offsets.append(offsets[-1] + len(value))
+            header["strings"][field] = {
+                "typecode": typecode_of(column.codes),
+                "codes": add_section(column.codes.tobytes()),
+                "values": add_section(b"".join(encoded)),
+                "offsets": add_section(offsets.tobytes()),
+            }
+        for field, values in numbers.items():
+            header["numbers"][field] = add_section(values.tobytes())
+
+        cube_keys, cube_cells = array("q"), array("d")
+        for key, cell in store.cube().items():
+            cube_keys.extend(key)
+            cube_cells.extend(cell)
+        header["cube"] = {"keys": add_section(cube_keys.tobytes()), "cells": add_section(cube_cells.tobytes())}
+
+        header_bytes = json.dumps(header).encode("utf-8")
+        header_bytes += b" " * (-(HEADER_LENGTH.size + len(header_bytes)) % SECTION_ALIGNMENT)
+        path = self._path(name, f"{generation}.tbl")
+        with open(path + ".tmp", "wb") as f:
+            f.write(HEADER_LENGTH.pack(len(header_bytes)))
+            f.write(header_bytes)
+            for data in sections:
+                f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+
+        pointer = self._path(name, "generation")
+        with open(pointer + ".tmp", "w") as f:
+            f.write(str(generation))
+        os.replace(pointer + ".tmp", pointer)
+
+        self._drop_old_generations(name, generation)
+        logger.info(f"Published {name} generation {generation} ({len(store)} rows, {offset} bytes)")
+        return generation
+
+    def _drop_old_generations(self, name: str, generation: int):
+        # Workers still mapping an unlinked file keep reading it until they re-attach (POSIX)
+        for filename in os.listdir(self.directory):
+            prefix, _, rest = filename.partition(".")
+            old, _, ext = rest.partition(".")
+            if prefix == name and ext == "tbl" and old.isdigit() and int(old) <= generation - self.keep_generations:
+                try:
+                    os.remove(os.path.join(self.directory, filename))
+                except OSError:
+                    pass
+
+    def attach(self, name: str) -> Optional[PlacementStore]:
+        """Read-only store over the latest published generation, or None if nothing was published."""
+        generation = self.generation(name)
+        with self._lock:
+            attached = self._attached.get(name)
+            if attached is not None and attached[0] == generation:
+                return attached[1]
+            if generation == 0:
+                return None
+
+            try:
+                with open(self._path(name, f"{generation}.tbl"), "rb") as f:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except FileNotFoundError:
+                # Superseded and cleaned up between reading the pointer and opening it
+                if attached is not None:
+                    return attached[1]
+                raise
+            view = memoryview(mapped)
+            header_length = HEADER_LENGTH.unpack_from(view)[0]
+            header = json.loads(bytes(view[HEADER_LENGTH.size:HEADER_LENGTH.size + header_length]))
+            base = HEADER_LENGTH.size + header_length
+
+            def section(bounds: list, typecode: str = "B") -> memoryview:
+                start, length = bounds
+                return view[base + start:base + start + length].cast(typecode)
+
+            strings = {
+                field: CategoricalColumn(
+                    MappedStrings(section(spec["values"]), section(spec["offsets"], "Q")),
+                    section(spec["codes"], spec["typecode"]),
+                )
+                for field, spec in header["strings"].items()
+            }
+            numbers = {field: section(bounds, "d") for field, bounds in header["numbers"].items()}
+            cube = None
+            if "cube" in header:
+                keys = section(header["cube"]["keys"], "q").tolist()
+                cells = section(header["cube"]["cells"], "d").tolist()
+                cube = {
+                    tuple(keys[i * CUBE_KEY_WIDTH:(i + 1) * CUBE_KEY_WIDTH]): [int(cells[j]), cells[j + 1], cells[j + 2]]
+                    for i, j in enumerate(range(0, len(cells), CUBE_CELL_WIDTH))
+                }
+            store = PlacementStore.from_columns(strings, numbers, cube)
+            self._attached[name] = (generation, store)
+            logger.info(f"Attached {name} generation {generation} ({header['rows']} rows)")
+            return store
+
+
+_shared: Optional[SharedTableStore] = None
+
+def get_shared_tables() -> Optional[SharedTableStore]:
+    """The shared table directory when SHARED_STATE_DIR is set (several processes on one host)."""
+    global _shared
+    if _shared is None and settings.SHARED_STATE_DIR:
+        _shared = SharedTableStore(settings.SHARED_STATE_DIR)
+    return _shared
+
+
+def current_placements() -> PlacementStore:
+    """
+    Placement table this worker should read: the latest shared generation when
+    SHARED_STATE_DIR is set, otherwise the in-process store.
+    """
+    shared = get_shared_tables()
+    if shared is None:
+        return placement_store
+    return shared.attach(PLACEMENT_TABLE) or PlacementStore()
+
+
+def update_placements(
+    placements: Iterable[InsurancePlacement], replace: bool = False, persist: bool = True
+) -> Tuple[int, PlacementStore]:
+    """
+    Upserts placements and returns (accepted, store now holding them).
+    In shared mode the latest generation is copied, updated and published as the next one.
+    With SQLite storage configured the rows are also persisted (unless `persist` is off).
+    """
+    placements = list(placements)
+    storage = get_storage()
+    if persist and storage is not None:
+        storage.save_placements(placements, replace)
+
+    shared = get_shared_tables()
+    if shared is None:
+        if replace:
+            placement_store.clear()
+        return placement_store.upsert(placements), placement_store
+
+    with shared.writer(PLACEMENT_TABLE):
+        base = None if replace else shared.attach(PLACEMENT_TABLE)
+        store = base.copy() if base is not None else PlacementStore()
+        accepted = store.upsert(placements)
+        shared.publish(PLACEMENT_TABLE, store)
+    return accepted, shared.attach(PLACEMENT_TABLE)
+
+
+def restore_placements() -> int:
+    """Reloads persisted placements at startup when nothing is loaded yet; returns the row count."""
+    storage = get_storage()
+    if storage is None or len(current_placements()) > 0:
+        return 0
+    placements = storage.load_placements()
+    if placements:
+        update_placements(placements, persist=False)
+        logger.info(f"Restored {len(placements)} placements from storage")
+    return len(placements)
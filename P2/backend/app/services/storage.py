@@ -0,0 +1,318 @@
+import contextlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from operator import attrgetter
+from typing import Dict, Iterable, List, Optional, Tuple
+from app.core.config import settings
+from app.models.domain import Policy, CSVRenewalData, InsurancePlacement, RenewalPipelineItem
+from app.services.placements import parse_placement_date, NO_EXPIRY, STORED_FIELDS
+from app.services.scoring import ScoringService, SECONDS_PER_DAY
+
+logger = logging.getLogger(__name__)
+
+POLICY_COLUMNS = [
+    "policyHash", "policyName", "policyType", "coverageAmount", "premium",
+    "startTime", "duration", "renewalCount", "notes", "status", "customer",
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS books (
+    book_id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    scored_max_premium REAL,
+    source_offset INTEGER
+);
+CREATE TABLE IF NOT EXISTS policies (
+    book_id TEXT NOT NULL,
+    policyHash TEXT NOT NULL,
+    policyName TEXT NOT NULL,
+    policyType TEXT NOT NULL,
+    coverageAmount INTEGER NOT NULL,
+    premium INTEGER NOT NULL,
+    startTime INTEGER NOT NULL,
+    duration INTEGER NOT NULL,
+    renewalCount INTEGER NOT NULL,
+    notes TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    customer TEXT NOT NULL,
+    expiry INTEGER NOT NULL,
+    score INTEGER,
+    scored_day INTEGER,
+    PRIMARY KEY (book_id, policyHash)
+);
+CREATE INDEX IF NOT EXISTS idx_policies_hash ON policies (policyHash);
+CREATE INDEX IF NOT EXISTS idx_policies_expiry ON policies (book_id, status, expiry);
+DROP INDEX IF EXISTS idx_policies_score;
+CREATE INDEX IF NOT EXISTS idx_policies_rank ON policies (book_id, status, score DESC, expiry, policyHash);
+CREATE INDEX IF NOT EXISTS idx_policies_premium ON policies (book_id, premium);
+CREATE TABLE IF NOT EXISTS renewal_data (
+    book_id TEXT NOT NULL,
+    policyHash TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (book_id, policyHash)
+);
+CREATE TABLE IF NOT EXISTS placements (
+    placementId TEXT NOT NULL,
+    carrierGroupLocalId TEXT NOT NULL,
+    carrierGroup TEXT NOT NULL,
+    productLine TEXT NOT NULL,
+    placementSpecialist TEXT NOT NULL,
+    placementClientSegmentCode TEXT NOT NULL,
+    expiry INTEGER NOT NULL,
+    totalPremium REAL NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (placementId, carrierGroupLocalId)
+);
+CREATE INDEX IF NOT EXISTS idx_placements_expiry ON placements (expiry);
+"""
+
+
+class SQLiteStore:
+    """
+    Optional embedded persistence for books (policies + CSV enrichment) and placements.
+    - Deltas are written in one transaction with executemany; books survive restarts
+    - Ranked reads push status, expiry window, score order and paging into indexed SQL,
+      so only the returned rows are loaded and turned into pipeline items
+    - A persisted `score` column (default weights) is refreshed incrementally: rows touched by
+      a delta are cleared, rows last scored on an earlier day are rescored, and everything is
+      rescored only when the book's max premium moved
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.RLock()
+        with self._lock:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(books)")}
+            if "source_offset" not in columns:  # databases created before event offsets were stored
+                self._conn.execute("ALTER TABLE books ADD COLUMN source_offset INTEGER")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """BEGIN/COMMIT on the autocommit connection, ROLLBACK on error. Callers hold the lock."""
+        self._conn.execute("BEGIN")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    # --- books ---
+
+    def save_delta(
+        self,
+        book_id: str,
+        version: int,
+        upserts: Iterable[Policy] = (),
+        deletes: Iterable[str] = (),
+        enrichment: Iterable[CSVRenewalData] = (),
+        source_offset: Optional[int] = None
+    ):
+        """
+        Persists a delta as `version`; touched rows lose their score.
+        `source_offset` (the event log position the delta brings the book to) is stored in the
+        same transaction, so a restarted ingestor resumes exactly after the persisted events.
+        """
+        policy_rows = [
+            (book_id, *(getattr(p, c) for c in POLICY_COLUMNS), int(p.startTime) + int(p.duration))
+            for p in upserts
+        ]
+        enrichment_rows = [(book_id, d.policyHash, d.model_dump_json(exclude_none=True)) for d in enrichment]
+        deletes = [(book_id, h) for h in deletes]
+        placeholders = ", ".join("?" * (len(POLICY_COLUMNS) + 2))
+
+        with self._lock, self._transaction():
+            self._conn.execute(
+                "INSERT INTO books (book_id, version, source_offset) VALUES (?, ?, ?) "
+                "ON CONFLICT(book_id) DO UPDATE SET version = excluded.version, "
+                "source_offset = COALESCE(excluded.source_offset, books.source_offset)",
+                (book_id, version, source_offset)
+            )
+            self._conn.executemany("DELETE FROM policies WHERE book_id = ? AND policyHash = ?", deletes)
+            self._conn.executemany("DELETE FROM renewal_data WHERE book_id = ? AND policyHash = ?", deletes)
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO policies (book_id, {', '.join(POLICY_COLUMNS)}, expiry) VALUES ({placeholders})",
+                policy_rows
+            )
+            self._conn.executemany("INSERT OR REPLACE INTO renewal_data VALUES (?, ?, ?)", enrichment_rows)
+            self._conn.executemany(
+                "UPDATE policies SET score = NULL WHERE book_id = ? AND policyHash = ?",
+                [(book_id, d.policyHash) for d in enrichment]
+            )
+
+    def load_book(self, book_id: str) -> Optional[Tuple[int, List[Policy], List[CSVRenewalData]]]:
+        """(version, policies, enrichment) of a persisted book, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT version FROM books WHERE book_id = ?", (book_id,)).fetchone()
+            if row is None:
+                return None
+            policies = self._conn.execute(
+                f"SELECT {', '.join(POLICY_COLUMNS)} FROM policies WHERE book_id = ?", (book_id,)
+            ).fetchall()
+            enrichment = self._conn.execute(
+                "SELECT data FROM renewal_data WHERE book_id = ?", (book_id,)
+            ).fetchall()
+        return (
+            row["version"],
+            [Policy(**dict(p)) for p in policies],
+            [CSVRenewalData.model_validate_json(e["data"]) for e in enrichment],
+        )
+
+    def source_offset(self, book_id: str) -> Optional[int]:
+        """Event log offset stored with the book's last ingested delta, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT source_offset FROM books WHERE book_id = ?", (book_id,)).fetchone()
+        return row["source_offset"] if row is not None else None
+
+    def has_book(self, book_id: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM books WHERE book_id = ?", (book_id,)).fetchone() is not None
+
+    def delete_book(self, book_id: str):
+        with self._lock, self._transaction():
+            for table in ("books", "policies", "renewal_data"):
+                self._conn.execute(f"DELETE FROM {table} WHERE book_id = ?", (book_id,))
+
+    def max_premium(self, book_id: str) -> float:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MAX(premium) FROM policies WHERE book_id = ? AND premium > 0", (book_id,)
+            ).fetchone()
+        return float(row[0] or 0.0)
+
+    def _enrichment_for(self, book_id: str, policy_hashes: List[str]) -> Dict[str, CSVRenewalData]:
+        result = {}
+        for i in range(0, len(policy_hashes), 500):
+            chunk = policy_hashes[i:i + 500]
+            rows = self._conn.execute(
+                f"SELECT policyHash, data FROM renewal_data WHERE book_id = ? AND policyHash IN ({', '.join('?' * len(chunk))})",
+                [book_id, *chunk]
+            ).fetchall()
+            for row in rows:
+                result[row["policyHash"]] = CSVRenewalData.model_validate_json(row["data"])
+        return result
+
+    def refresh_scores(self, book_id: str, now: Optional[int] = None) -> int:
+        """
+        Brings the persisted default-weight scores up to date; returns how many rows were rescored.
+        """
+        now = int(time.time()) if now is None else now
+        today = now // SECONDS_PER_DAY
+        with self._lock:
+            max_premium = self.max_premium(book_id)
+            book = self._conn.execute("SELECT scored_max_premium FROM books WHERE book_id = ?", (book_id,)).fetchone()
+            if book is None:
+                return 0
+            where = "book_id = ? AND status = 1"
+            params: list = [book_id]
+            if book["scored_max_premium"] == max_premium:
+                where += " AND (score IS NULL OR scored_day != ?)"
+                params.append(today)
+            rows = self._conn.execute(f"SELECT {', '.join(POLICY_COLUMNS)} FROM policies WHERE {where}", params).fetchall()
+            policies = [Policy(**dict(r)) for r in rows]
+            csv_map = self._enrichment_for(book_id, [p.policyHash for p in policies])
+
+            updates = []
+            for policy in policies:
+                factors = ScoringService.calculate_priority_factors(policy, [], csv_map.get(policy.policyHash), max_premium)
+                updates.append((ScoringService.calculate_total_score(factors), today, book_id, policy.policyHash))
+            with self._transaction():
+                self._conn.executemany(
+                    "UPDATE policies SET score = ?, scored_day = ? WHERE book_id = ? AND policyHash = ?", updates
+                )
+                self._conn.execute("UPDATE books SET scored_max_premium = ? WHERE book_id = ?", (max_premium, book_id))
+        if updates:
+            logger.info(f"Rescored {len(updates)} policies in book {book_id}")
+        return len(updates)
+
+    def ranked_pipeline(
+        self,
+        book_id: str,
+        limit: int = 50,
+        offset: int = 0,
+        time_window_days: Optional[int] = None,
+        now: Optional[int] = None
+    ) -> List[RenewalPipelineItem]:
+        """
+        One page of the default-weight pipeline read in score order from the persisted column;
+        only the returned rows are turned into pipeline items.
+        """
+        now = int(time.time()) if now is None else now
+        self.refresh_scores(book_id, now)
+        query = f"SELECT {', '.join(POLICY_COLUMNS)}, score FROM policies WHERE book_id = ? AND status = 1"
+        params: list = [book_id]
+        if time_window_days is not None:
+            query += " AND expiry <= ?"
+            params.append(now + time_window_days * SECONDS_PER_DAY)
+        # Same tie-break as ScoringService.build_pipeline, so /ranked and /pipeline pages agree
+        query += " ORDER BY score DESC, expiry, policyHash LIMIT ? OFFSET ?"
+        params += [limit, offset]
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+            csv_map = self._enrichment_for(book_id, [r["policyHash"] for r in rows])
+            max_premium = self.max_premium(book_id)
+
+        items = []
+        for row in rows:
+            policy = Policy(**{c: row[c] for c in POLICY_COLUMNS})
+            days = ScoringService.calculate_days_until_expiry(policy)
+            items.append(RenewalPipelineItem(
+                policy=policy,
+                daysUntilExpiry=days,
+                priorityScore=row["score"],
+                urgencyLevel=ScoringService.get_urgency_level(days),
+                factors=ScoringService.calculate_priority_factors(policy, [], csv_map.get(policy.policyHash), max_premium),
+            ))
+        return items
+
+    # --- placements ---
+
+    def save_placements(self, placements: Iterable[InsurancePlacement], replace: bool = False) -> int:
+        """Accepts models or PlacementRows; the JSON column holds the stored (non-computed) fields."""
+        stored = attrgetter(*STORED_FIELDS)
+        rows = []
+        for p in placements:
+            expiry = parse_placement_date(p.placementExpiryDate)
+            rows.append((
+                p.placementId, p.carrierGroupLocalId, p.carrierGroup, p.productLine, p.placementSpecialist,
+                p.placementClientSegmentCode, expiry.toordinal() if expiry else NO_EXPIRY, p.totalPremium,
+                json.dumps(dict(zip(STORED_FIELDS, stored(p)))),
+            ))
+        with self._lock, self._transaction():
+            if replace:
+                self._conn.execute("DELETE FROM placements")
+            self._conn.executemany("INSERT OR REPLACE INTO placements VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def load_placements(self) -> List[InsurancePlacement]:
+        with self._lock:
+            rows = self._conn.execute("SELECT data FROM placements").fetchall()
+        return [InsurancePlacement.model_validate_json(r["data"]) for r in rows]
+
+
+_storage: Optional[SQLiteStore] = None
+_storage_lock = threading.Lock()
+
+def get_storage() -> Optional[SQLiteStore]:
+    """The SQLite store when SQLITE_PATH is configured, else None (in-memory only)."""
+    global _storage
+    if _storage is None and settings.SQLITE_PATH:
+        with _storage_lock:
+            if _storage is None:
+                _storage = SQLiteStore(settings.SQLITE_PATH)
+                logger.info(f"Using SQLite storage at {settings.SQLITE_PATH}")
+    return _storage
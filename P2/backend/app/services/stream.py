@@ -0,0 +1,154 @@
+import asyncio
+import logging
+import time
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from app.models.domain import PriorityWeights, RenewalPipelineItem, PipelineRowUpdate, PipelineStreamEvent
+from app.services.book import PolicyBook
+from app.services.scoring import SECONDS_PER_DAY
+
+logger = logging.getLogger(__name__)
+
+# Open stream connections across all books (checked against STREAM_MAX_SUBSCRIBERS)
+active_subscriptions = 0
+
+
+def parse_event_id(value: str) -> Tuple[int, Optional[int]]:
+    """(version, day) from a stream event id ("12:20380"); a bare version has no day."""
+    version, _, day = value.partition(":")
+    return int(version), int(day) if day else None
+
+
+class PipelineSubscription:
+    """
+    One streaming client's view of a book's pipeline.
+    - Pushes a row only when it enters/leaves the pipeline, changes urgency level,
+      or its score moved by at least `min_score_delta` since the value last sent
+    - Days until expiry move with the clock, not the version: the pipeline is also
+      re-checked on the first heartbeat tick after the day changes
+    - Backpressure: the book wakeup is a coalescing event and the generator only runs
+      when the client has drained the previous message, so a slow client skips
+      intermediate versions instead of queueing them. Per-connection memory is the
+      last-sent row state, which never grows past the book size
+    """
+
+    def __init__(
+        self,
+        book: PolicyBook,
+        weights: Optional[PriorityWeights] = None,
+        min_score_delta: int = 5,
+        since_version: Optional[int] = None,
+        since_day: Optional[int] = None
+    ):
+        self.book = book
+        self.weights = weights
+        self.min_score_delta = min_score_delta
+        self.since_version = since_version
+        self.since_day = since_day
+        # policyHash -> (rank, score, urgency) as last sent to the client
+        self._sent: Dict[str, Tuple[int, int, str]] = {}
+
+    def initial_event(
+        self, version: int, pipeline: List[RenewalPipelineItem], day: Optional[int] = None
+    ) -> Optional[PipelineStreamEvent]:
+        """
+        First message for a new connection; `day` is the epoch day `pipeline` was scored on.
+        - No (or too old) `since_version`: full snapshot with reset=True
+        - Resume from another (or an unknown) day: also a reset, since the clock alone may
+          have moved rows across urgency levels while the client was away
+        - Resumable `since_version`: only rows touched since then; None if nothing changed
+        """
+        day = int(time.time()) // SECONDS_PER_DAY if day is None else day
+        touched = None
+        if self.since_version is not None and self.since_day == day:
+            touched = self.book.changed_since(self.since_version)
+
+        current = {}
+        for rank, item in enumerate(pipeline, start=1):
+            current[item.policy.policyHash] = (rank, item.priorityScore, item.urgencyLevel)
+        self._sent = current
+
+        if touched is None:
+            rows = [self._row(h, state) for h, state in current.items()]
+            return PipelineStreamEvent(bookId=self.book.book_id, version=version, day=day, reset=True, rows=rows)
+
+        rows = [
+            self._row(h, current[h]) if h in current else PipelineRowUpdate(policyHash=h)
+            for h in touched
+        ]
+        if not rows:
+            return None
+        return PipelineStreamEvent(bookId=self.book.book_id, version=version, day=day, rows=rows)
+
+    def diff(self, pipeline: List[RenewalPipelineItem]) -> List[PipelineRowUpdate]:
+        """Rows that changed enough to push, updating the last-sent state as it goes."""
+        rows = []
+        seen = set()
+        for rank, item in enumerate(pipeline, start=1):
+            policy_hash = item.policy.policyHash
+            seen.add(policy_hash)
+            previous = self._sent.get(policy_hash)
+            if previous is not None:
+                _, prev_score, prev_urgency = previous
+                if (prev_urgency == item.urgencyLevel
+                        and abs(item.priorityScore - prev_score) < self.min_score_delta):
+                    continue
+            state = (rank, item.priorityScore, item.urgencyLevel)
+            self._sent[policy_hash] = state
+            rows.append(self._row(policy_hash, state, previous))
+
+        for policy_hash in [h for h in self._sent if h not in seen]:
+            _, prev_score, prev_urgency = self._sent.pop(policy_hash)
+            rows.append(PipelineRowUpdate(
+                policyHash=policy_hash, previousScore=prev_score, previousUrgency=prev_urgency
+            ))
+        return rows
+
+    @staticmethod
+    def _row(policy_hash: str, state: Tuple[int, int, str], previous: Optional[Tuple[int, int, str]] = None) -> PipelineRowUpdate:
+        return PipelineRowUpdate(
+            policyHash=policy_hash,
+            rank=state[0],
+            priorityScore=state[1],
+            urgencyLevel=state[2],
+            previousScore=previous[1] if previous else None,
+            previousUrgency=previous[2] if previous else None,
+        )
+
+    @staticmethod
+    def format_sse(event: PipelineStreamEvent) -> str:
+        # The id carries the day too, so a Last-Event-ID resume knows which day the client saw
+        return f"id: {event.version}:{event.day}\nevent: pipeline\ndata: {event.model_dump_json(exclude_none=True)}\n\n"
+
+    async def stream(self, heartbeat_seconds: float = 15.0) -> AsyncIterator[str]:
+        """
+        Server-Sent Events generator: initial snapshot/resume, then diffs on each version bump
+        or day change. Sends a comment line as heartbeat when the book is idle.
+        """
+        global active_subscriptions
+        wakeup = self.book.subscribe()
+        active_subscriptions += 1
+        try:
+            day = int(time.time()) // SECONDS_PER_DAY
+            version, pipeline = await asyncio.to_thread(self.book.cached_pipeline, self.weights)
+            first = self.initial_event(version, pipeline, day)
+            if first is not None:
+                yield self.format_sse(first)
+
+            while True:
+                try:
+                    await asyncio.wait_for(wakeup.wait(), timeout=heartbeat_seconds)
+                    wakeup.clear()
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+
+                today = int(time.time()) // SECONDS_PER_DAY
+                if self.book.version == version and today == day:
+                    continue
+                day = today
+                version, pipeline = await asyncio.to_thread(self.book.cached_pipeline, self.weights)
+                rows = self.diff(pipeline)
+                if rows:
+                    yield self.format_sse(PipelineStreamEvent(bookId=self.book.book_id, version=version, day=day, rows=rows))
+        finally:
+            active_subscriptions -= 1
+            self.book.unsubscribe(wakeup)
@@ -0,0 +1,269 @@
+"""
+Load-test harness for the scoring API.
+
+Drives the app either in-process (httpx ASGITransport, one event loop, i.e. what a single
+uvicorn worker sees) or against a running server via --base-url, with N concurrent
+clients issuing a weighted mix of requests.
+
+    python loadtest.py --concurrency 200 --requests 2000 --book-size 500
+    python loadtest.py --base-url http://localhost:8000 --mix pipeline=3,ingest_csv=1
+    python loadtest.py --output run.json --compare baseline.json
+
+Reports throughput and p50/p95/p99 latency per endpoint; --output saves the run as JSON
+and --compare prints the change against a previously saved run.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import httpx
+
+# Add current dir to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+API = "/api/v1"
+SCENARIOS = ["pipeline", "ingest_csv", "book_pipeline", "book_windows"]
+DEFAULT_MIX = "pipeline=4,ingest_csv=1,book_pipeline=4,book_windows=1"
+PERCENTILES = [50, 95, 99]
+
+
+def make_policies(count: int, rng: random.Random) -> List[dict]:
+    now = int(time.time())
+    return [
+        {
+            "policyHash": f"lt_{i}",
+            "policyName": f"Load Test Policy {i}",
+            "policyType": rng.choice(["GL", "Property", "Cyber", "D&O"]),
+            "coverageAmount": rng.randint(100000, 5000000),
+            "premium": rng.randint(500, 50000),
+            "startTime": now - 86400 * rng.randint(0, 365),
+            "duration": 86400 * 365,
+            "renewalCount": rng.randint(0, 5),
+            "status": rng.choice([1, 1, 1, 0, 2]),
+            "customer": f"Client {i % 200}",
+        }
+        for i in range(count)
+    ]
+
+
+def make_renewal_csv(policies: List[dict], rng: random.Random) -> str:
+    lines = ["policyHash,claimsCount,carrierRating,churnRisk"]
+    for policy in policies:
+        lines.append(f"{policy['policyHash']},{rng.randint(0, 6)},{rng.uniform(1, 5):.1f},{rng.randint(0, 100)}")
+    return "\n".join(lines)
+
+
+def parse_mix(mix: str) -> Dict[str, int]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise ValueError(f"Unknown scenario '{name}'. Use {SCENARIOS}")
+        weights[name] = int(weight or 1)
+    return {k: v for k, v in weights.items() if v > 0}
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(samples: Dict[str, List[float]], errors: Dict[str, int], elapsed: float) -> Dict[str, dict]:
+    results = {}
+    for name in sorted(set(samples) | set(errors)):
+        latencies = sorted(samples.get(name, []))
+        stats = {
+            "requests": len(latencies) + errors.get(name, 0),
+            "errors": errors.get(name, 0),
+            "throughput": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+            "meanMs": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+            "maxMs": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        }
+        for pct in PERCENTILES:
+            stats[f"p{pct}Ms"] = round(percentile(latencies, pct) * 1000, 2)
+        results[name] = stats
+    return results
+
+
+class LoadTest:
+    """
+    Runs a request mix against the app with a fixed number of concurrent clients.
+    Fixtures (policy book, enrichment CSV) are generated once from the seed so runs are comparable.
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        concurrency: int = 50,
+        total_requests: int = 1000,
+        book_size: int = 500,
+        csv_rows: int = 500,
+        mix: str = DEFAULT_MIX,
+        seed: int = 42
+    ):
+        self.client = client
+        self.concurrency = concurrency
+        self.total_requests = total_requests
+        self.mix = parse_mix(mix)
+        self.rng = random.Random(seed)
+        self.policies = make_policies(book_size, self.rng)
+        self.csv_content = make_renewal_csv(self.policies[:csv_rows], self.rng)
+        self.book_id: Optional[str] = None
+        self.samples: Dict[str, List[float]] = {name: [] for name in self.mix}
+        self.errors: Dict[str, int] = {}
+
+    async def setup(self):
+        if "book_pipeline" in self.mix or "book_windows" in self.mix:
+            res = await self.client.post(f"{API}/books", json={"policies": self.policies, "csv_content": self.csv_content})
+            res.raise_for_status()
+            self.book_id = res.json()["bookId"]
+
+    async def teardown(self):
+        if self.book_id:
+            await self.client.delete(f"{API}/books/{self.book_id}")
+
+    def _request(self, name: str):
+        if name == "pipeline":
+            return self.client.post(f"{API}/scoring/pipeline", json={"policies": self.policies, "csv_content": self.csv_content})
+        if name == "ingest_csv":
+            files = {"file": ("renewals.csv", self.csv_content.encode(), "text/csv")}
+            return self.client.post(f"{API}/scoring/ingest/csv", files=files)
+        if name == "book_pipeline":
+            return self.client.post(f"{API}/books/{self.book_id}/pipeline")
+        return self.client.get(f"{API}/books/{self.book_id}/windows")
+
+    async def _worker(self, schedule: List[str]):
+        while schedule:
+            name = schedule.pop()
+            start = time.perf_counter()
+            try:
+                res = await self._request(name)
+                ok = res.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                self.samples[name].append(time.perf_counter() - start)
+            else:
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+    async def run(self) -> dict:
+        names, weights = zip(*self.mix.items())
+        schedule = self.rng.choices(names, weights=weights, k=self.total_requests)
+
+        started_at = datetime.now(timezone.utc).isoformat()
+        await self.setup()
+        try:
+            start = time.perf_counter()
+            await asyncio.gather(*(self._worker(schedule) for _ in range(self.concurrency)))
+            elapsed = time.perf_counter() - start
+        finally:
+            await self.teardown()
+
+        return {
+            "startedAt": started_at,
+            "config": {
+                "concurrency": self.concurrency,
+                "requests": self.total_requests,
+                "bookSize": len(self.policies),
+                "mix": self.mix,
+            },
+            "elapsedSeconds": round(elapsed, 3),
+            "throughput": round(sum(len(s) for s in self.samples.values()) / elapsed, 2) if elapsed else 0.0,
+            "endpoints": summarize(self.samples, self.errors, elapsed),
+        }
+
+
+async def run_load_test(base_url: Optional[str] = None, **options) -> dict:
+    """Runs one load test, in-process unless `base_url` points at a running server."""
+    limits = httpx.Limits(max_connections=options.get("concurrency", 50))
+    if base_url:
+        client = httpx.AsyncClient(base_url=base_url, timeout=None, limits=limits)
+    else:
+        from main import app
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadtest", timeout=None)
+    async with client:
+        return await LoadTest(client, **options).run()
+
+
+def compare(current: dict, baseline: dict) -> Dict[str, dict]:
+    """Relative change (%) per endpoint metric; positive latency deltas are regressions."""
+    deltas = {}
+    for name, stats in current["endpoints"].items():
+        base = baseline.get("endpoints", {}).get(name)
+        if not base:
+            continue
+        deltas[name] = {
+            metric: round((stats[metric] - base[metric]) / base[metric] * 100, 1)
+            for metric in ["throughput"] + [f"p{p}Ms" for p in PERCENTILES]
+            if base.get(metric)
+        }
+    return deltas
+
+
+def print_report(results: dict, deltas: Optional[Dict[str, dict]] = None):
+    config = results["config"]
+    print(f"{config['requests']} requests, concurrency {config['concurrency']}, book size {config['bookSize']}: "
+          f"{results['elapsedSeconds']}s, {results['throughput']} req/s")
+    print(f"{'endpoint':<16}{'reqs':>7}{'errs':>6}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, stats in results["endpoints"].items():
+        print(f"{name:<16}{stats['requests']:>7}{stats['errors']:>6}{stats['throughput']:>9}"
+              f"{stats['p50Ms']:>10}{stats['p95Ms']:>10}{stats['p99Ms']:>10}{stats['maxMs']:>10}")
+    if deltas:
+        print("\nChange vs baseline (%):")
+        for name, metrics in deltas.items():
+            print(f"{name:<16}" + "  ".join(f"{metric} {value:+}" for metric, value in metrics.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the scoring API")
+    parser.add_argument("--base-url", help="Target a running server instead of the in-process app")
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--book-size", type=int, default=500)
+    parser.add_argument("--csv-rows", type=int, default=500)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Weighted scenarios, e.g. {DEFAULT_MIX}")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Save results as JSON")
+    parser.add_argument("--compare", help="Previously saved results to compare against")
+    args = parser.parse_args()
+    # Per-request client logs would dominate the output (and the timings)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    results = asyncio.run(run_load_test(
+        args.base_url,
+        concurrency=args.concurrency,
+        total_requests=args.requests,
+        book_size=args.book_size,
+        csv_rows=args.csv_rows,
+        mix=args.mix,
+        seed=args.seed,
+    ))
+
+    deltas = None
+    if args.compare:
+        with open(args.compare) as f:
+            deltas = compare(results, json.load(f))
+        results["comparedTo"] = args.compare
+        results["deltas"] = deltas
+    print_report(results, deltas)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,43 @@
+import asyncio
+import logging
+import os
+import tempfile
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from app.api.v1.api import api_router
+from app.services.events import get_event_ingestor
+from app.services.bulk import shutdown_ingest_pool
+from app.services.shared import get_shared_tables, restore_placements
+
+logger = logging.getLogger(__name__)
+
+# Singleton name claimed in SHARED_STATE_DIR by the one process that tails the event log
+EVENT_INGESTOR_CLAIM = "contract-events"
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Reload persisted placements (no-op without SQLITE_PATH)
+    await asyncio.to_thread(restore_placements)
+    # Follow the contract event log in the background when one is configured; with a shared
+    # state directory only the process holding the claim does
+    tasks = []
+    ingestor = get_event_ingestor()
+    shared = get_shared_tables()
+    if ingestor and shared is not None and not shared.claim(EVENT_INGESTOR_CLAIM):
+        logger.info("Contract event log is tailed by another process")
+    elif ingestor:
+        tasks.append(asyncio.create_task(ingestor.tail(settings.CONTRACT_EVENT_POLL_SECONDS)))
+    yield
+    for task in tasks:
+        task.cancel()
+    shutdown_ingest_pool()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan
 )
 
 # Set all CORS enabled origins
@@ -24,6 +56,31 @@ app.include_router(api_router, prefix=settings.API_V1_STR)
 def root():
     return {"status": "ok", "version": "1.0.0", "service": "Broker Copilot Advanced Backend"}
 
+def launch_options() -> dict:
+    """
+    uvicorn.run keyword arguments for the configured WORKERS. Several workers only run in the
+    experimental shared mode, where they find the placement tables through a SHARED_STATE_DIR
+    exported to their environment (a fresh tmpfs directory when none is configured).
+    """
+    if settings.WORKERS <= 1:
+        return {"reload": True}
+    if not settings.SHARED_WORKERS_EXPERIMENTAL:
+        raise SystemExit(
+            f"WORKERS={settings.WORKERS} needs SHARED_WORKERS_EXPERIMENTAL=true: only placement "
+            "tables are shared between workers; books, PATCH versions, stream subscribers and the "
+            "reject quarantine stay per-worker. Bulk parsing already uses INGEST_WORKERS processes."
+        )
+    if not settings.SHARED_STATE_DIR:
+        shm = "/dev/shm" if os.path.isdir("/dev/shm") else None
+        settings.SHARED_STATE_DIR = tempfile.mkdtemp(prefix="broker-copilot-", dir=shm)
+    # Workers are fresh processes that build their own settings from the environment
+    os.environ["SHARED_STATE_DIR"] = settings.SHARED_STATE_DIR
+    logger.warning(
+        f"Experimental shared mode: {settings.WORKERS} workers share placement tables in "
+        f"{settings.SHARED_STATE_DIR}; books and streams are per-worker"
+    )
+    return {"workers": settings.WORKERS}
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, **launch_options())
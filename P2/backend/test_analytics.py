@@ -0,0 +1,214 @@
+import sys
+import os
+import tempfile
+from collections import defaultdict
+from datetime import date
+# Add current dir to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi.testclient import TestClient
+from main import app, launch_options
+from app.core.config import settings
+from app.services.ingest import IngestionService
+from app.services.rejects import RejectTracker
+from app.services import shared
+from app.services.shared import SharedTableStore, PLACEMENT_TABLE
+from app.services.placements import PlacementStore, CategoricalColumn, parse_placement_date, placement_row_key
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+PLACEMENT_FILE = os.path.join(DATA_DIR, "Techfestsampledata_scrambled.csv")
+
+client = TestClient(app)
+
+def load_placements():
+    with open(PLACEMENT_FILE, encoding="utf-8") as f:
+        return IngestionService.parse_placement_csv(f.read())
+
+def test_rollups_match_full_scan():
+    print("Testing portfolio rollups...")
+    placements = load_placements()
+    store = PlacementStore()
+    store.upsert(placements)
+    today = date(2025, 9, 1)
+
+    rollup = store.rollup(["carrierGroup"], expiry_to_days=365, today=today)
+    expected = defaultdict(float)
+    unique_rows = {placement_row_key(p): p for p in placements}
+    for p in unique_rows.values():
+        expiry = parse_placement_date(p.placementExpiryDate)
+        if expiry and (expiry - today).days <= 365:
+            expected[p.carrierGroup] += p.totalPremium
+    actual = {row.group["carrierGroup"]: row.totalPremium for row in rollup.rows}
+    assert actual.keys() == expected.keys()
+    for carrier, premium in expected.items():
+        assert abs(actual[carrier] - premium) < 0.01
+
+    # Upserting a row replaces its contribution instead of double counting
+    before = store.rollup([], today=today).rows[0]
+    changed = placements[0].model_copy(update={"totalPremium": placements[0].totalPremium + 1000})
+    store.upsert([changed])
+    after = store.rollup([], today=today).rows[0]
+    assert after.placementCount == before.placementCount
+    assert abs(after.totalPremium - before.totalPremium - 1000) < 0.01
+
+    store.remove([placement_row_key(changed)])
+    assert store.rollup([], today=today).rows[0].placementCount == before.placementCount - 1
+
+def test_rollup_endpoint():
+    with open(PLACEMENT_FILE, "rb") as f:
+        res = client.post("/api/v1/analytics/placements?replace=true", files={"file": ("placements.csv", f, "text/csv")})
+    assert res.status_code == 200, res.text
+    print(f"Ingested: {res.json()}")
+
+    res = client.get("/api/v1/analytics/rollup", params={
+        "group_by": ["productLine", "placementClientSegmentCode"], "carrierGroup": "Liberty Insurance Group"
+    })
+    assert res.status_code == 200, res.text
+    assert all(set(row["group"]) == {"productLine", "placementClientSegmentCode"} for row in res.json()["rows"])
+
+    assert client.get("/api/v1/analytics/rollup", params={"group_by": "client"}).status_code == 400
+
+def test_bulk_ingest():
+    print("Testing bulk multi-source ingest...")
+    book_id = client.post("/api/v1/books", json={"policies": []}).json()["bookId"]
+    renewal_csv = "policyHash,claims,rating\nhash1,2,4.5\nhash2,not_a_number,3\n,1,1\n"
+    files = {"renewal_file": ("renewal.csv", renewal_csv, "text/csv")}
+    for field, name in [("email_file", "email_data.csv"), ("calendar_file", "calendar_data.csv"),
+                        ("placement_file", "Techfestsampledata_scrambled.csv")]:
+        with open(os.path.join(DATA_DIR, name), encoding="utf-8") as f:
+            files[field] = (name, f.read(), "text/csv")
+
+    res = client.post("/api/v1/scoring/ingest/bulk", files=files, data={"book_id": book_id, "replace_placements": "true"})
+    assert res.status_code == 200, res.text
+    report = res.json()
+    print(f"Bulk ingest report: {report}")
+    by_kind = {f["kind"]: f for f in report["files"]}
+    assert by_kind["placement"]["accepted"] == 1348
+    assert by_kind["email"]["accepted"] == 20 and by_kind["calendar"]["accepted"] == 20
+    # The row without a policy hash is rejected; the bad claims cell is dropped, not the row
+    assert by_kind["renewal"]["rows"] == 3 and by_kind["renewal"]["rejected"] == 1
+    assert by_kind["renewal"]["rejectReasons"] == {"missing_policy_hash": 1}
+    assert by_kind["renewal"]["cellIssues"] == {"invalid_claimsCount": 1}
+    quarantine = client.get(f"/api/v1/scoring/ingest/quarantine/{by_kind['renewal']['quarantineId']}")
+    assert quarantine.status_code == 200
+    assert quarantine.text.splitlines()[1] == "4,missing_policy_hash,,1,1"
+    # Leading blank lines still count towards the reported file line
+    tracker = RejectTracker(source="renewal")
+    IngestionService.parse_csv_content("\n\n" + renewal_csv, rejects=tracker)
+    assert [row[0] for row in tracker.rows] == [6]
+    assert report["bookVersion"] == 1
+    assert report["unmatchedEmails"] == 0 and report["linkedClients"] > 0
+
+    # Activity alone links against the stored placement table's client dictionary
+    activity = {field: files[field] for field in ("email_file", "calendar_file")}
+    res = client.post("/api/v1/scoring/ingest/bulk", files=activity)
+    assert res.status_code == 200, res.text
+    assert res.json()["unmatchedEmails"] == 0 and res.json()["linkedClients"] == report["linkedClients"]
+
+    # Renewal enrichment has nowhere to go without a book
+    res = client.post("/api/v1/scoring/ingest/bulk", files={"renewal_file": ("renewal.csv", renewal_csv, "text/csv")})
+    assert res.status_code == 400
+
+def test_categorical_columns():
+    print("Testing dictionary-encoded placement columns...")
+    placements = load_placements()
+    store = PlacementStore()
+    store.upsert(placements)
+    unique_rows = {placement_row_key(p): p for p in placements}
+    assert len(store) == len(unique_rows)
+    assert {placement_row_key(p): p for p in store.placements()} == unique_rows
+
+    filters = {"participationStatusCode": "QUOTATION_STATUS_QUOTED", "placementClientSegmentCode": "CLIENT_SEGMENT_MIDDLE_MKT"}
+    expected = [p for p in unique_rows.values() if all(getattr(p, f) == v for f, v in filters.items())]
+    selected = store.select(filters)
+    print(f"Selected {len(selected)} placements; column bytes: {store.nbytes()}")
+    assert sorted(map(placement_row_key, selected)) == sorted(map(placement_row_key, expected))
+    assert store.select({"carrierGroup": "No Such Carrier"}) == []
+
+    # Removal keeps columns dense and rows intact
+    removed = list(unique_rows)[:10]
+    store.remove(removed)
+    assert len(store) == len(unique_rows) - 10
+    assert {placement_row_key(p): p for p in store.placements()} == {k: v for k, v in unique_rows.items() if k not in removed}
+
+    # Codes widen past 256 distinct values
+    column = CategoricalColumn()
+    for i in range(300):
+        column.append(f"v{i % 260}")
+    assert column.codes.typecode == "H" and column.decode(column.codes[299]) == "v39"
+    assert column.mask(column.lookup("v5")).count(1) == 2
+
+    res = client.get("/api/v1/analytics/placements", params={"productLine": "Casualty", "limit": 5})
+    assert res.status_code == 200 and all(p["productLine"] == "Casualty" for p in res.json())
+
+def test_shared_placement_table():
+    print("Testing shared placement table...")
+    placements = load_placements()
+    today = date(2025, 9, 1)
+    with tempfile.TemporaryDirectory() as directory:
+        writer, reader = SharedTableStore(directory), SharedTableStore(directory)  # two workers
+        assert reader.attach(PLACEMENT_TABLE) is None
+
+        local = PlacementStore()
+        local.upsert(placements)
+        assert writer.publish(PLACEMENT_TABLE, local) == 1
+        mapped = reader.attach(PLACEMENT_TABLE)
+        assert mapped.read_only and len(mapped) == len(local)
+        assert mapped.placements() == local.placements()
+        assert mapped.rollup(["carrierGroup"], today=today) == local.rollup(["carrierGroup"], today=today)
+        # The cube comes from the table file, not from a pass over the mapped rows
+        assert mapped.cube() == local.cube()
+        assert PlacementStore.from_columns(*mapped.columns()).cube() == local.cube()
+
+        # One process per directory wins a claim (flock is per open file, so this holds in-process too)
+        assert writer.claim("contract-events") and writer.claim("contract-events")
+        assert not reader.claim("contract-events")
+        assert reader.attach(PLACEMENT_TABLE) is mapped  # same generation, no re-attach
+
+        # Updates go through a writable copy and a new generation
+        original, shared._shared = shared._shared, writer
+        try:
+            changed = placements[0].model_copy(update={"totalPremium": 1.0})
+            accepted, store = shared.update_placements([changed])
+            assert accepted == 1 and len(store) == len(local)
+        finally:
+            shared._shared = original
+        remapped = reader.attach(PLACEMENT_TABLE)
+        assert writer.generation(PLACEMENT_TABLE) == 2 and remapped is not mapped
+        assert remapped.select({"placementId": changed.placementId, "carrierGroupLocalId": changed.carrierGroupLocalId})[0].totalPremium == 1.0
+
+def test_launch_options():
+    print("Testing worker launch options...")
+    saved = (settings.WORKERS, settings.SHARED_WORKERS_EXPERIMENTAL, settings.SHARED_STATE_DIR)
+    saved_env = os.environ.get("SHARED_STATE_DIR")
+    try:
+        settings.WORKERS, settings.SHARED_WORKERS_EXPERIMENTAL, settings.SHARED_STATE_DIR = 1, False, None
+        assert launch_options() == {"reload": True}
+        # Several workers only share placement tables, so they need the explicit opt-in
+        settings.WORKERS = 3
+        try:
+            launch_options()
+            assert False, "WORKERS > 1 without the experimental flag should refuse to start"
+        except SystemExit as exc:
+            assert "SHARED_WORKERS_EXPERIMENTAL" in str(exc)
+        settings.SHARED_WORKERS_EXPERIMENTAL = True
+        assert launch_options() == {"workers": 3}
+        # Workers inherit a directory to share through
+        directory = settings.SHARED_STATE_DIR
+        assert directory and os.path.isdir(directory) and os.environ["SHARED_STATE_DIR"] == directory
+        os.rmdir(directory)
+    finally:
+        settings.WORKERS, settings.SHARED_WORKERS_EXPERIMENTAL, settings.SHARED_STATE_DIR = saved
+        if saved_env is None:
+            os.environ.pop("SHARED_STATE_DIR", None)
+        else:
+            os.environ["SHARED_STATE_DIR"] = saved_env
+
+if __name__ == "__main__":
+    test_rollups_match_full_scan()
+    test_rollup_endpoint()
+    test_bulk_ingest()
+    test_categorical_columns()
+    test_shared_placement_table()
+    test_launch_options()
+    print("Verification Complete.")
@@ -0,0 +1,273 @@
+import sys
+import os
+import json
+import time
+import asyncio
+import random
+import tempfile
+import sqlite3
+# Add current dir to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi.testclient import TestClient
+from main import app
+from app.models.domain import Policy, CSVRenewalData
+from app.services.book import PolicyBook, BookVersionConflict, books
+from app.services import storage as storage_module
+from app.services.storage import SQLiteStore
+from app.services.stream import PipelineSubscription, parse_event_id
+from app.services.scoring import TIME_WINDOWS
+
+client = TestClient(app)
+
+def make_policy(policy_hash: str, premium: int = 5000, days_left: int = 60, status: int = 1) -> dict:
+    now = int(time.time())
+    return Policy(
+        policyHash=policy_hash, policyName=f"Policy {policy_hash}", policyType="GL",
+        coverageAmount=1000000, premium=premium, startTime=now - 86400,
+        duration=86400 * (days_left + 1), renewalCount=0, status=status, customer="Corp A"
+    ).model_dump()
+
+def test_book_versioning():
+    print("Testing versioned policy book...")
+    book = PolicyBook("unit")
+    book.apply_delta(None, upserts=[Policy(**make_policy("a", 100)), Policy(**make_policy("b", 1000))])
+    assert book.version == 1
+    assert book._max_premium == 1000
+
+    # Deleting the max premium policy rescans the max
+    book.apply_delta(1, deletes=["b"])
+    assert book.version == 2 and book._max_premium == 100
+
+    try:
+        book.apply_delta(1, deletes=["a"])
+        assert False, "stale delta should conflict"
+    except BookVersionConflict as e:
+        print(f"Conflict detected: {e}")
+
+def test_book_endpoints():
+    res = client.post("/api/v1/books", json={"policies": [make_policy("a", 100, 10), make_policy("b", 9000, 200)]})
+    assert res.status_code == 200, res.text
+    state = res.json()
+    assert state["version"] == 1 and state["size"] == 2
+    book_id = state["bookId"]
+
+    # The ranking is recorded at creation, so the first PATCH already gets a diff
+    res = client.patch(f"/api/v1/books/{book_id}", json={
+        "baseVersion": 1, "upserts": [make_policy("c", 10, 300)], "includeChanges": True
+    })
+    body = res.json()
+    assert body["version"] == 2 and not body["reset"]
+    print(f"Rank changes after upsert: {[(c['rank'], c['item']['policy']['policyHash']) for c in body['changes']]}")
+    assert [c["item"]["policy"]["policyHash"] for c in body["changes"]] == ["c"]
+
+    # Weights never ranked before at the base version: full reset
+    weights = {"premiumAtRisk": 1, "timeToExpiry": 0, "claimsHistory": 0, "carrierResponsiveness": 0, "churnLikelihood": 0}
+    res = client.patch(f"/api/v1/books/{book_id}", json={"baseVersion": 2, "weights": weights, "includeChanges": True})
+    assert res.json()["reset"] and len(res.json()["changes"]) == 3
+
+    # The diff follows the caller's base version, not whichever ranking was requested last
+    res = client.patch(f"/api/v1/books/{book_id}", json={
+        "baseVersion": 2, "deletes": ["c"], "includeChanges": True
+    })
+    body = res.json()
+    assert body["version"] == 3 and body["changes"] == [] and body["removed"] == ["c"]
+
+    res = client.patch(f"/api/v1/books/{book_id}", json={"baseVersion": 1, "deletes": ["a"]})
+    assert res.status_code == 409
+
+    # A version reached without includeChanges is diffable once a pipeline was built at it
+    res = client.patch(f"/api/v1/books/{book_id}", json={"baseVersion": 3, "upserts": [make_policy("d", 50, 100)]})
+    assert res.json()["version"] == 4
+    res = client.post(f"/api/v1/books/{book_id}/pipeline")
+    assert len(res.json()) == 3
+    res = client.patch(f"/api/v1/books/{book_id}", json={
+        "baseVersion": 4, "deletes": ["d"], "includeChanges": True
+    })
+    body = res.json()
+    assert not body["reset"] and body["changes"] == [] and body["removed"] == ["d"]
+
+def test_pipeline_stream():
+    print("Testing pipeline change stream...")
+    book = PolicyBook("stream")
+    book.apply_delta(None, upserts=[Policy(**make_policy("a", 100, 200)), Policy(**make_policy("b", 9000, 200))])
+
+    async def run():
+        events = PipelineSubscription(book, min_score_delta=5).stream(heartbeat_seconds=0.05)
+        first = await events.__anext__()
+        snapshot = json.loads(first.split("data: ", 1)[1])
+        assert snapshot["reset"] and len(snapshot["rows"]) == 2
+
+        assert await events.__anext__() == ": heartbeat\n\n"
+
+        # "a" moves from low to critical urgency; "b" is unchanged and not pushed
+        book.apply_delta(1, upserts=[Policy(**make_policy("a", 100, 3))])
+        update = json.loads((await events.__anext__()).split("data: ", 1)[1])
+        print(f"Pushed update: {update}")
+        assert update["version"] == 2
+        assert [row["policyHash"] for row in update["rows"]] == ["a"]
+        assert update["rows"][0]["urgencyLevel"] == "critical"
+        await events.aclose()
+
+        # Resuming from version 1 on the same day only replays rows touched since then
+        today = int(time.time()) // 86400
+        resumed = PipelineSubscription(book, since_version=1, since_day=today).initial_event(*book.cached_pipeline())
+        assert not resumed.reset and [row.policyHash for row in resumed.rows] == ["a"]
+        # Without a day, or from an earlier one, the clock may have moved rows: full snapshot
+        assert PipelineSubscription(book, since_version=1).initial_event(*book.cached_pipeline()).reset
+        assert PipelineSubscription(book, since_version=1, since_day=today - 1).initial_event(*book.cached_pipeline()).reset
+        assert parse_event_id(f"1:{today}") == (1, today) and parse_event_id("1") == (1, None)
+
+    asyncio.run(run())
+    assert not book._subscribers
+
+def test_pipeline_stream_day_change():
+    print("Testing pipeline stream across a day change...")
+    book = PolicyBook("stream-clock")
+    book.apply_delta(None, upserts=[Policy(**make_policy("a", 100, 31)), Policy(**make_policy("b", 9000, 200))])
+    real_time = time.time
+
+    async def run():
+        events = PipelineSubscription(book).stream(heartbeat_seconds=0.05)
+        snapshot = json.loads((await events.__anext__()).split("data: ", 1)[1])
+        assert {row["policyHash"]: row["urgencyLevel"] for row in snapshot["rows"]}["a"] == "medium"
+        assert await events.__anext__() == ": heartbeat\n\n"
+
+        # No delta arrives, but a day later "a" is 30 days out and turns high urgency
+        time.time = lambda: real_time() + 86400
+        message = await events.__anext__()
+        assert message.startswith(f"id: 1:{int(time.time()) // 86400}\n")
+        update = json.loads(message.split("data: ", 1)[1])
+        assert update["version"] == 1
+        assert [(row["policyHash"], row["urgencyLevel"]) for row in update["rows"]] == [("a", "high")]
+        await events.aclose()
+
+    try:
+        asyncio.run(run())
+    finally:
+        time.time = real_time
+
+def test_expiry_windows():
+    print("Testing expiry index windows...")
+    rng = random.Random(7)
+    book = PolicyBook("windows")
+    policies = [
+        Policy(**make_policy(f"p{i}", rng.randint(100, 10000), rng.randint(0, 400), rng.choice([0, 1, 1, 1, 2])))
+        for i in range(300)
+    ]
+    book.apply_delta(None, upserts=policies)  # bulk path: one sort
+    # incremental path: move a few expiries and drop one
+    book.apply_delta(None, upserts=[Policy(**make_policy("p1", 500, 3)), Policy(**make_policy("p2", 500, 250))], deletes=["p3"])
+    book.apply_delta(None, enrichment=[
+        CSVRenewalData(policyHash=f"p{i}", claimsCount=rng.randint(0, 6), churnRisk=rng.randint(0, 100))
+        for i in range(0, 300, 2)
+    ])
+
+    full = book.pipeline()
+    for window in TIME_WINDOWS:
+        windowed = book.pipeline(time_window_days=window["days"])
+        expected = {item.policy.policyHash: item.priorityScore for item in full if item.daysUntilExpiry <= window["days"]}
+        assert {item.policy.policyHash: item.priorityScore for item in windowed} == expected
+
+    counts = book.window_counts()
+    print(f"Window counts: {counts}")
+    assert counts.total == len(full)
+    for window in counts.windows:
+        assert window.count == sum(1 for item in full if item.daysUntilExpiry <= window.days)
+    for level, count in counts.urgency.items():
+        assert count == sum(1 for item in full if item.urgencyLevel == level)
+
+    res = client.post("/api/v1/scoring/pipeline?time_window_days=30", json={"policies": [make_policy("a", days_left=10), make_policy("b", days_left=60)]})
+    assert [item["policy"]["policyHash"] for item in res.json()] == ["a"]
+
+def test_score_explanations():
+    print("Testing on-demand score explanations...")
+    book = PolicyBook("explain")
+    book.apply_delta(None, upserts=[Policy(**make_policy("a", 100, 3)), Policy(**make_policy("b", 9000, 200))])
+    scores = {item.policy.policyHash: item.priorityScore for item in book.pipeline()}
+
+    explained = book.explain(["a", "missing"])
+    print(f"Breakdown for a: {explained['a']}")
+    assert list(explained) == ["a"]
+    breakdown = explained["a"]
+    assert breakdown.total == scores["a"]
+    assert abs(sum(f.score for f in breakdown.factors) - breakdown.total) <= len(breakdown.factors)
+    assert sum(f.maxScore for f in breakdown.factors) == 100
+    assert breakdown.factors[1].impact == "positive"  # 3 days left
+
+    # Served from the cache until the book changes
+    assert book.explain(["a"])["a"] is breakdown
+    book.apply_delta(None, upserts=[Policy(**make_policy("c", 50, 100))])
+    assert book.explain(["a"])["a"] is not breakdown
+
+    res = client.post("/api/v1/books", json={"policies": [make_policy("a", 100, 10)]})
+    book_id = res.json()["bookId"]
+    res = client.post(f"/api/v1/books/{book_id}/explain", json={"policyHashes": ["a"]})
+    assert res.status_code == 200, res.text
+    assert len(res.json()["a"]["factors"]) == 5
+
+def test_sqlite_storage():
+    print("Testing SQLite-backed books...")
+    rng = random.Random(11)
+    with tempfile.TemporaryDirectory() as directory:
+        store = SQLiteStore(os.path.join(directory, "books.db"))
+        original, storage_module._storage = storage_module._storage, store
+        try:
+            policies = [
+                Policy(**make_policy(f"s{i}", rng.randint(100, 10000), rng.randint(0, 400), rng.choice([0, 1, 1, 2])))
+                for i in range(200)
+            ]
+            book = books.create()
+            book.apply_delta(None, upserts=policies)
+            book.apply_delta(None, deletes=["s0"])
+
+            # Dropped from memory (e.g. a restart) and reloaded from SQLite on access
+            books._books.pop(book.book_id)
+            reloaded = books.get(book.book_id)
+            assert reloaded is not book and reloaded.version == 2 and len(reloaded) == 199
+            assert reloaded.changed_since(1) is None and reloaded.changed_since(2) == set()
+
+            # A failed write-through leaves memory and the version untouched
+            closed = SQLiteStore(os.path.join(directory, "closed.db"))
+            closed.close()
+            reloaded.storage = closed
+            try:
+                reloaded.apply_delta(2, deletes=["s1"])
+                assert False, "write to a closed store should fail"
+            except sqlite3.ProgrammingError:
+                pass
+            reloaded.storage = store
+            assert reloaded.version == 2 and reloaded.get("s1") is not None
+
+            expected = [(item.policy.policyHash, item.priorityScore) for item in reloaded.pipeline(time_window_days=90)]
+            page = store.ranked_pipeline(book.book_id, limit=1000, time_window_days=90)
+            # Same order, ties included
+            assert [(item.policy.policyHash, item.priorityScore) for item in page] == expected
+            assert len({s for _, s in expected}) < len(expected)
+
+            # Scores are only recomputed for touched rows
+            assert store.refresh_scores(book.book_id) == 0
+            active = next(p for p in policies[1:] if p.status == 1)
+            reloaded.apply_delta(None, upserts=[active.model_copy(update={"premium": 150})])
+            assert store.refresh_scores(book.book_id) == 1
+
+            res = client.get(f"/api/v1/books/{book.book_id}/ranked", params={"limit": 5})
+            assert res.status_code == 200 and len(res.json()) == 5
+
+            # Deleting a book that is only in storage (not loaded) still works
+            books._books.pop(book.book_id)
+            assert store.has_book(book.book_id)
+            assert books.delete(book.book_id) and not store.has_book(book.book_id)
+        finally:
+            storage_module._storage = original
+            store.close()
+
+if __name__ == "__main__":
+    test_book_versioning()
+    test_book_endpoints()
+    test_pipeline_stream()
+    test_pipeline_stream_day_change()
+    test_expiry_windows()
+    test_score_explanations()
+    test_sqlite_storage()
+    print("Verification Complete.")
@@ -0,0 +1,152 @@
+import sys
+import os
+import json
+import tempfile
+# Add current dir to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.book import PolicyBook, books
+from app.services import storage as storage_module
+from app.services.storage import SQLiteStore
+from app.services.events import ContractEventIngestor
+
+def write_events(path: str, events: list):
+    with open(path, "a", encoding="utf-8") as f:
+        for event in events:
+            f.write(json.dumps(event) + "\n")
+
+def test_event_replay_and_checkpoint():
+    print("Testing contract event ingestion...")
+    with tempfile.TemporaryDirectory() as tmp:
+        log_path = os.path.join(tmp, "events.jsonl")
+        write_events(log_path, [
+            {"event": "PolicyCreated", "hash": "h1", "customer": "0xabc", "policyName": "Fleet",
+             "policyType": "Auto", "coverageAmount": 100000, "premium": 2500, "durationInDays": 365,
+             "timestamp": 1700000000},
+            {"event": "PolicySigned", "hash": "h1", "timestamp": 1700000100},
+            {"event": "PolicyRenewed", "hash": "h1", "renewalCount": 1, "additionalDays": 30},
+            {"event": "PolicySigned", "hash": "unknown"},
+            "not json",
+            # Skipped as a whole: its additionalDays must not be folded in
+            {"event": "PolicyRenewed", "hash": "h1", "renewalCount": "abc", "additionalDays": 30},
+        ])
+
+        book = PolicyBook("chain")
+        ingestor = ContractEventIngestor(book, log_path, batch_size=2, snapshot_events=3)
+        assert ingestor.run_once() == 3
+        policy = book.get("h1")
+        print(f"Replayed policy: status={policy.status} duration={policy.duration} renewals={policy.renewalCount}")
+        assert policy.status == 1 and policy.startTime == 1700000100
+        assert policy.duration == 395 * 86400 and policy.renewalCount == 1
+        assert ingestor.events_skipped == 3
+
+        # Half-written line is left for the next poll
+        with open(log_path, "a", encoding="utf-8") as f:
+            f.write('{"event": "PolicyExpired", "hash": "h1"}')
+        assert ingestor.run_once() == 0
+
+        # A restarted worker restores the snapshot and only replays the new event
+        with open(log_path, "a", encoding="utf-8") as f:
+            f.write("\n")
+        restarted = PolicyBook("chain")
+        resumed = ContractEventIngestor(restarted, log_path)
+        assert restarted.get("h1").status == 1
+        assert resumed.run_once() == 1
+        assert restarted.get("h1").status == 2
+
+def test_invalid_events_are_skipped():
+    print("Testing invalid contract events...")
+    with tempfile.TemporaryDirectory() as tmp:
+        log_path = os.path.join(tmp, "events.jsonl")
+        write_events(log_path, [
+            {"event": "PolicyCreated", "hash": "good", "customer": "0xabc", "premium": 100,
+             "durationInDays": 30, "timestamp": 1700000000},
+            # Parses, but the policy it builds fails validation: skipped with its follow-up
+            {"event": "PolicyCreated", "hash": "bad", "customer": None, "durationInDays": 30},
+            {"event": "PolicySigned", "hash": "bad"},
+            {"event": "PolicySigned", "hash": "good"},
+        ])
+
+        book = PolicyBook("chain")
+        ingestor = ContractEventIngestor(book, log_path)
+        assert ingestor.run_once() == 2
+        assert book.get("good").status == 1 and book.get("bad") is None
+        assert ingestor.events_skipped == 2
+        assert ingestor.offset == os.path.getsize(log_path)
+
+        # A batch that fails to apply is not checkpointed past; the next poll replays it
+        write_events(log_path, [{"event": "PolicyExpired", "hash": "good"}])
+        offset = ingestor.offset
+        apply_delta = book.apply_delta
+
+        def failing_apply(*args, **kwargs):
+            raise RuntimeError("disk full")
+
+        book.apply_delta = failing_apply
+        try:
+            ingestor.run_once()
+            assert False, "apply failure should propagate"
+        except RuntimeError:
+            pass
+        assert ingestor.offset == offset
+        book.apply_delta = apply_delta
+        assert ingestor.run_once() == 1 and book.get("good").status == 2
+
+        # Only the offset is checkpointed; no snapshot is due yet
+        with open(ingestor.checkpoint_path) as f:
+            assert "policies" not in json.load(f)
+        assert not os.path.exists(ingestor.snapshot_path)
+
+def test_persisted_book_resumes_after_crash():
+    print("Testing crash mid catch-up with a persisted book...")
+    with tempfile.TemporaryDirectory() as tmp:
+        log_path = os.path.join(tmp, "events.jsonl")
+        store = SQLiteStore(os.path.join(tmp, "books.db"))
+        original, storage_module._storage = storage_module._storage, store
+        try:
+            write_events(log_path, [
+                {"event": "PolicyCreated", "hash": "h1", "customer": "0xabc", "premium": 100,
+                 "durationInDays": 365, "timestamp": 1700000000},
+                {"event": "PolicySigned", "hash": "h1"},
+            ])
+            book = books.get_or_create("chain-persisted")
+            assert ContractEventIngestor(book, log_path).run_once() == 2
+
+            # The renewal batch commits, then the process dies on the next batch of the same poll
+            write_events(log_path, [
+                {"event": "PolicyRenewed", "hash": "h1", "renewalCount": 1, "additionalDays": 30},
+                {"event": "PolicyExpired", "hash": "h1"},
+            ])
+            ingestor = ContractEventIngestor(book, log_path, batch_size=1)
+            apply_delta = book.apply_delta
+            calls = []
+
+            def crash_on_second_batch(*args, **kwargs):
+                calls.append(1)
+                if len(calls) == 2:
+                    raise SystemExit("killed")
+                return apply_delta(*args, **kwargs)
+
+            book.apply_delta = crash_on_second_batch
+            try:
+                ingestor.run_once()
+                assert False, "second batch should crash"
+            except SystemExit:
+                pass
+
+            # Restart: the book reloads from SQLite and the renewal is not applied twice
+            books._books.pop("chain-persisted")
+            restarted = books.get("chain-persisted")
+            assert restarted.get("h1").duration == 395 * 86400
+            assert ContractEventIngestor(restarted, log_path).run_once() == 1
+            assert restarted.get("h1").duration == 395 * 86400 and restarted.get("h1").status == 2
+            books.delete("chain-persisted")
+        finally:
+            storage_module._storage = original
+            store.close()
+
+if __name__ == "__main__":
+    test_event_replay_and_checkpoint()
+    test_invalid_events_are_skipped()
+    test_persisted_book_resumes_after_crash()
+    print("Verification Complete.")
@@ -0,0 +1,26 @@
+import sys
+import os
+import asyncio
+# Add current dir to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from loadtest import run_load_test, compare, percentile
+
+def test_load_test_harness():
+    print("Testing in-process load test...")
+    assert percentile([1, 2, 3, 4, 5, 6, 7, 8, 9, 10], 50) == 5
+    assert percentile([1, 2, 3, 4, 5, 6, 7, 8, 9, 10], 99) == 10
+
+    results = asyncio.run(run_load_test(concurrency=8, total_requests=40, book_size=50, csv_rows=20))
+    print(f"Endpoints: {results['endpoints']}")
+    assert sum(stats["requests"] for stats in results["endpoints"].values()) == 40
+    for stats in results["endpoints"].values():
+        assert stats["errors"] == 0
+        assert stats["p50Ms"] <= stats["p95Ms"] <= stats["p99Ms"] <= stats["maxMs"]
+
+    deltas = compare(results, results)
+    assert all(value == 0 for metrics in deltas.values() for value in metrics.values())
+
+if __name__ == "__main__":
+    test_load_test_harness()
+    print("Verification Complete.")
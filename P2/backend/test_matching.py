@@ -0,0 +1,52 @@
+import sys
+import os
+# Add current dir to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.ingest import IngestionService
+from app.services.matching import ClientMatcher, normalize_client_name, link_client_activity
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+
+def test_client_matching():
+    print("Testing blocked fuzzy client matching...")
+    matcher = ClientMatcher(["Apex Group", "Apex Corporation", "Apex Incorporated", "Global Technologies"])
+
+    assert normalize_client_name("Apex Corp.") == "apex corporation"
+    assert matcher.resolve("Apex Corp.") == "apex corporation"
+    # Distinct clients sharing a prefix must not collapse
+    assert matcher.resolve("Apex Group") == "apex group"
+    assert matcher.resolve("Apex Inc") == "apex incorporated"
+    assert matcher.resolve("Globl Technologies") == "global technologies"
+    assert matcher.resolve("Global Technologies LLC") == "global technologies"
+    assert matcher.resolve("Zenith Partners") is None
+    print(f"Resolved names: {matcher.mapping()}")
+
+def test_matching_with_common_grams():
+    # " technologies" grams are shared by every client and skipped by the blocking index;
+    # they must still count when the candidates are scored
+    names = [f"Client{i} Technologies" for i in range(2000)] + ["Global Technologies"]
+    matcher = ClientMatcher(names)
+    assert matcher.resolve("Globl Technologies") == "global technologies"
+    assert matcher.resolve("Global Technologes") == "global technologies"
+    assert matcher.resolve("Zenith Technologies") is None
+
+def test_activity_feeds_link_to_placements():
+    with open(os.path.join(DATA_DIR, "calendar_data.csv"), encoding="utf-8") as f:
+        meetings = IngestionService.parse_calendar_csv(f.read())
+    with open(os.path.join(DATA_DIR, "Techfestsampledata_scrambled.csv"), encoding="utf-8") as f:
+        placements = IngestionService.parse_placement_csv(f.read())
+
+    # Unquoted participant lists are folded back into one column
+    assert meetings[0].participants == ["john@broker.com", "ops@globaltech.com"]
+    assert meetings[0].sourceLink.startswith("https://")
+
+    report = link_client_activity(placements, [], meetings)
+    print(f"Linked {len(report.clients)} clients, unmatched meetings: {report.unmatchedMeetings}")
+    assert not report.unmatchedMeetings
+
+if __name__ == "__main__":
+    test_client_matching()
+    test_matching_with_common_grams()
+    test_activity_feeds_link_to_placements()
+    print("Verification Complete.")
@@ -6,7 +6,8 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from app.services.scoring import ScoringService
 from app.services.ingest import IngestionService
-from app.models.domain import Policy
+from app.models.domain import Policy, IngestFileReport
+from app.services.rejects import RejectTracker
 
 def test_v2_logic():
     print("Testing Production-Grade Services...")
@@ -41,5 +42,25 @@ def test_v2_logic():
         
     print("Verification Complete.")
 
+def test_reject_accounting():
+    print("Testing reject accounting...")
+    dirty_csv = "policyHash,claims,rating\n" + "\n".join(
+        f"h{i},{'x' if i % 3 == 0 else i % 5},4" if i % 10 else f",{i},4" for i in range(1, 101)
+    )
+    report = IngestFileReport(kind="renewal")
+    rejects = RejectTracker(source="renewal")
+    results = IngestionService.parse_csv_content(dirty_csv, report, rejects)
+
+    print(f"Report: {report}")
+    assert report.rows == 100 and report.rejected == 10 and len(results) == 90
+    assert report.rejectReasons == {"missing_policy_hash": 10}
+    # Bad claims cells are dropped but their rows are kept
+    assert report.cellIssues["invalid_claimsCount"] == sum(1 for i in range(1, 101) if i % 3 == 0 and i % 10)
+
+    quarantine = rejects.to_csv().splitlines()
+    assert quarantine[0] == "line,reason,policyHash,claims,rating"
+    assert quarantine[1] == "11,missing_policy_hash,,10,4"
+
 if __name__ == "__main__":
     test_v2_logic()
+    test_reject_accounting()